@@ -111,14 +111,32 @@ class OK:
                                               'default_horizontal_variance', 0),
                                           default_vertical_variance=template_matching.get('default_vertical_variance',
                                                                                           0),
-                                          default_threshold=template_matching.get('default_threshold', 0))
-
+                                          default_threshold=template_matching.get('default_threshold', 0),
+                                          pyramid_scale=template_matching.get('pyramid_scale', 0.5),
+                                          cache_folder=template_matching.get('cache_folder', 'cache/features'),
+                                          track_margin=template_matching.get('track_margin', 0.01),
+                                          match_cache_size=template_matching.get('match_cache_size', 256),
+                                          match_cache_max_bytes=template_matching.get('match_cache_max_bytes',
+                                                                                      1024 * 1024),
+                                          use_atlas=template_matching.get('use_atlas', False),
+                                          engine=template_matching.get('engine', 'template'),
+                                          keypoint_categories=template_matching.get('keypoint_categories'),
+                                          resolution_cache_size=template_matching.get('resolution_cache_size', 4),
+                                          resolution_cache_mb=template_matching.get('resolution_cache_mb', 256),
+                                          keypoint_threshold=template_matching.get('keypoint_threshold', 0.25),
+                                          keypoint_variance=template_matching.get('keypoint_variance', 1.0))
+
+        ocr_config = self.config.get('ocr') if isinstance(self.config.get('ocr'), dict) else {}
         from ok.task.TaskExecutor import TaskExecutor
         self.task_executor = TaskExecutor(self.device_manager, exit_event=self.exit_event,
                                           onetime_tasks=self.config.get('onetime_tasks', []),
                                           trigger_tasks=self.config.get('trigger_tasks', []),
                                           feature_set=self.feature_set,
-                                          config_folder=self.config.get("config_folder"), debug=self.debug)
+                                          config_folder=self.config.get("config_folder"), debug=self.debug,
+                                          match_workers=(template_matching or {}).get('match_workers', 0),
+                                          ocr_cache_size=ocr_config.get('cache_size', 128),
+                                          ocr_cache_ttl=ocr_config.get('cache_ttl', 5),
+                                          ocr_change_threshold=ocr_config.get('change_threshold', 0))
 
         ok.gui.executor = self.task_executor
 
@@ -128,8 +146,8 @@ class OK:
                 self.app.show_path_ascii_error(path)
                 self.init_error = True
                 return False
-            from rapidocr_openvino import RapidOCR
-            self.ocr = RapidOCR()
+            from ok.ocr.OcrBackend import create_backend
+            self.ocr = create_backend(self.config.get('ocr'))
             self.task_executor.ocr = self.ocr
 
         if not check_mutex():
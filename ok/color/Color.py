@@ -115,13 +115,15 @@ def calculate_colorfulness(image, box=None):
     return colorfulness / 100
 
 
-def get_saturation(image, box=None):
+def get_saturation(image, box=None, frame_cache=None):
     # Load the image
 
     # Check if image loaded successfully
     if image is None:
         raise ValueError("Image not found or path is incorrect")
 
+    # Convert image to HSV color space, through the frame cache if given
+    hsv_image = None
     if box is not None:
         if (box.x >= 0 and box.y >= 0 and
             box.x + box.width <= image.shape[1] and  # image.shape[1] is the width of the image
@@ -129,11 +131,14 @@ def get_saturation(image, box=None):
                 0]) and box.width > 0 and box.height > 0:  # image.shape[0] is the height of the image
 
             # Extract the region of interest (ROI) using slicing
-
+            if frame_cache is not None:
+                hsv_image = frame_cache.hsv_area(image, box.x, box.y, box.x + box.width, box.y + box.height)
             image = image[box.y:box.y + box.height, box.x:box.x + box.width, :3]
+    elif frame_cache is not None:
+        hsv_image = frame_cache.hsv(image)
 
-    # Convert image to HSV color space
-    hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    if hsv_image is None:
+        hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
 
     # Extract the saturation channel
     saturation_channel = hsv_image[:, :, 1]
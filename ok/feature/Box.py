@@ -1,11 +1,16 @@
 import math
 import random
-import re
-from functools import cmp_to_key
 from typing import List
 
+import numpy as np
+
+from ok.feature.BoxIndex import BoxIndex
+from ok.feature.NameMatcher import get_name_matcher
+
 
 class Box:
+    __slots__ = ('name', 'x', 'y', 'width', 'height', 'confidence')
+
     def __init__(self, x: int | float, y: int | float, width: int | float = 0, height: int | float = 0,
                  confidence: float = 1,
                  name=None, to_x: int | float = -1, to_y: int | float = -1) -> None:
@@ -35,6 +40,8 @@ class Box:
                 self.name == other.name)
 
     def in_boundary(self, boxes):
+        if isinstance(boxes, (BoxList, BoxIndex)):
+            return boxes.within(self)
         in_boundary_boxes = []
         for box in boxes:
             if (self.x <= box.x and self.x + self.width >= box.x + box.width and
@@ -102,6 +109,8 @@ class Box:
         return self.x + self.width / 2, self.y + self.height / 2
 
     def find_closest_box(self, direction: str, boxes: list, condition=None):
+        if isinstance(boxes, BoxIndex):
+            return boxes.closest(self, direction, condition)
         orig_x, orig_y, orig_w, orig_h = self.x, self.y, self.width, self.height
 
         def distance_criteria(box):
@@ -149,44 +158,63 @@ def find_highest_confidence_box(boxes):
 
 
 def sort_boxes(boxes: List[Box]) -> List[Box]:
-    def box_intersect(box1, box2):
-        return not (box1.y > box2.y + box2.height or box1.y + box1.height < box2.y)
-
-    def compare_boxes(box1, box2):
-        if box_intersect(box1, box2):
-            cmp = box1.x - box2.x
-            if cmp == 0:
-                cmp = box1.y - box2.y
+    """
+    Sort the boxes in reading order, a box joins a row when the vertical center of the shorter of it and the shortest
+    box of the row falls inside the other one, rows from top to bottom and boxes within a row from left to right, ties
+    broken by y, confidence then original position so the order is stable. Text lines that touch or overlap by a few
+    pixels stay apart, while a small box next to a taller one in the same line joins its row.
+    """
+    if len(boxes) < 2:
+        return boxes if isinstance(boxes, BoxList) else list(boxes)
+    if isinstance(boxes, BoxList):
+        x, y, height, confidence = boxes.x, boxes.y, boxes.height, boxes.confidence
+    else:
+        x = np.fromiter((box.x for box in boxes), dtype=np.int64, count=len(boxes))
+        y = np.fromiter((box.y for box in boxes), dtype=np.int64, count=len(boxes))
+        height = np.fromiter((box.height for box in boxes), dtype=np.int64, count=len(boxes))
+        confidence = np.fromiter((box.confidence for box in boxes), dtype=np.float64, count=len(boxes))
+    index = np.arange(len(boxes))
+    # walk the boxes from top to bottom, each row is compared by its shortest box so a tall box does not pull in
+    # the lines below it
+    by_top = np.lexsort((index, y))
+    row = np.empty(len(boxes), dtype=np.int64)
+    row_index = -1
+    row_top = row_height = 0
+    for i, top, box_height in zip(by_top.tolist(), y[by_top].tolist(), height[by_top].tolist()):
+        if row_index >= 0 and box_height <= row_height:
+            same_row = row_top <= top + box_height / 2 < row_top + row_height
+        elif row_index >= 0:
+            same_row = top <= row_top + row_height / 2 < top + box_height
         else:
-            cmp = box1.y - box2.y
-            if cmp == 0:
-                cmp = box1.x - box2.y
-        if cmp == 0:
-            cmp = box1.confidence - box2.confidence
-        if cmp == 0:
-            cmp = box1.name - box2.name
-
-        return cmp
-
-    return sorted(boxes, key=cmp_to_key(compare_boxes))
+            same_row = False
+        if not same_row:
+            row_index += 1
+            row_top, row_height = top, box_height
+        elif box_height < row_height:
+            row_top, row_height = top, box_height
+        row[i] = row_index
+    order = np.lexsort((index, confidence, y, x, row))
+    if isinstance(boxes, BoxList):
+        return boxes[order]
+    return [boxes[i] for i in order]
 
 
 def find_box_by_name(boxes, names) -> Box:
-    if isinstance(names, (str, re.Pattern)):
-        names = [names]
+    matcher = get_name_matcher(names)
+
+    if isinstance(boxes, BoxList):
+        return boxes.first_by_name(matcher)
 
     result = None
-    priority = len(names)
+    priority = len(matcher.names)
 
     for box in boxes:
-        for i, name in enumerate(names):
-            if (isinstance(name, str) and name == box.name) or (
-                    isinstance(name, re.Pattern) and re.search(name, box.name)):
-                if i < priority:
-                    priority = i
-                    result = box
-                    if i == 0:
-                        break
+        box_priority = matcher.priority(box.name)
+        if box_priority is not None and box_priority < priority:
+            priority = box_priority
+            result = box
+            if priority == 0:
+                break
 
     return result
 
@@ -202,6 +230,9 @@ def find_boxes_within_boundary(boxes, boundary_box):
     Returns:
     - list[Box]: Boxes found within the boundary box.
     """
+    if isinstance(boxes, (BoxList, BoxIndex)):
+        return boxes.within(boundary_box)
+
     within_boundary = []
 
     for box in boxes:
@@ -216,6 +247,8 @@ def find_boxes_within_boundary(boxes, boundary_box):
 
 
 def average_width(boxes: List[Box]) -> int:
+    if isinstance(boxes, BoxList):
+        return boxes.average_width()
     total_width = sum(box.width for box in boxes)
     return int(total_width / len(boxes)) if boxes else 0
 
@@ -238,26 +271,13 @@ def crop_image(image, box=None):
 
 
 def find_boxes_by_name(boxes, names) -> list[Box]:
-    # Ensure names is always a list
-    if isinstance(names, (str, re.Pattern)):
-        names = [names]
+    # names can be a name, a pattern, a list of them or a NameMatcher, lists are compiled once and cached
+    matcher = get_name_matcher(names)
 
-    result = []
+    if isinstance(boxes, BoxList):
+        return boxes.by_name(matcher)
 
-    for box in boxes:
-        # Flag to track if the box has been matched and should be added
-        matched = False
-        for name in names:
-            if matched:
-                break  # Stop checking names if we've already matched this box
-            if (isinstance(name, str) and name == box.name) or (isinstance(box.name, str) and
-                                                                isinstance(name, re.Pattern) and re.search(name,
-                                                                                                           box.name)):
-                matched = True
-        if matched:
-            result.append(box)
-
-    return result
+    return [box for box in boxes if matcher.matches(box.name)]
 
 
 def boxes_to_map_by_list_of_names(boxes: list[Box], name_list: list[str]) -> dict[str, Box]:
@@ -278,3 +298,148 @@ def relative_box(frame_width, frame_height, x, y, to_x=1, to_y=1, width=0, heigh
     return Box(round(x * frame_width), round(y * frame_height),
                round(width * frame_width), round(height * frame_height),
                name=name)
+
+
+BOX_DTYPE = np.dtype([('x', np.int32), ('y', np.int32), ('width', np.int32), ('height', np.int32),
+                      ('confidence', np.float64)])
+
+
+class BoxList:
+    __slots__ = ('data', 'names')
+
+    def __init__(self, boxes=None, data=None, names=None) -> None:
+        """
+        A list of boxes stored as a NumPy structured array plus an array of names, for vectorized filtering of
+        large results like a full page of OCR. Iterating or indexing it yields Box objects, and the box helpers of
+        this module return a BoxList when given one.
+
+        Args:
+            boxes (list[Box]): The boxes to store.
+            data (np.ndarray): Or directly the structured array of BOX_DTYPE.
+            names (np.ndarray): The object array of the names, same length as data.
+        """
+        if data is None:
+            boxes = boxes or []
+            data = np.array([(box.x, box.y, box.width, box.height, box.confidence) for box in boxes], dtype=BOX_DTYPE)
+            names = np.array([box.name for box in boxes] + [None], dtype=object)[:-1]
+        elif names is None:
+            names = np.full(len(data), None, dtype=object)
+        self.data = data
+        self.names = names
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.data['x']
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.data['y']
+
+    @property
+    def width(self) -> np.ndarray:
+        return self.data['width']
+
+    @property
+    def height(self) -> np.ndarray:
+        return self.data['height']
+
+    @property
+    def confidence(self) -> np.ndarray:
+        return self.data['confidence']
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self._box(index)
+        return BoxList(data=self.data[index], names=self.names[index])
+
+    def __repr__(self):
+        return f'BoxList({self.to_list()})'
+
+    def _box(self, i) -> Box:
+        row = self.data[i]
+        return _new_box(int(row['x']), int(row['y']), int(row['width']), int(row['height']), float(row['confidence']),
+                        self.names[i])
+
+    def to_list(self) -> List[Box]:
+        data = self.data
+        return list(map(_new_box, data['x'].tolist(), data['y'].tolist(), data['width'].tolist(),
+                        data['height'].tolist(), data['confidence'].tolist(), self.names.tolist()))
+
+    def filter(self, mask) -> 'BoxList':
+        """
+        Keep the boxes where the boolean mask is True, e.g. boxes.filter(boxes.confidence > 0.8).
+        """
+        return self[np.asarray(mask, dtype=bool)]
+
+    def within(self, boundary_box) -> 'BoxList':
+        """
+        The boxes entirely within the boundary box.
+        """
+        x, y, width, height = self.x, self.y, self.width, self.height
+        return self.filter((x >= boundary_box.x) & (y >= boundary_box.y) &
+                           (x + width <= boundary_box.x + boundary_box.width) &
+                           (y + height <= boundary_box.y + boundary_box.height))
+
+    def crop(self, boundary_box) -> 'BoxList':
+        """
+        The boxes clipped to the boundary box, boxes outside of it are dropped.
+        """
+        x1 = np.maximum(self.x, boundary_box.x)
+        y1 = np.maximum(self.y, boundary_box.y)
+        x2 = np.minimum(self.x + self.width, boundary_box.x + boundary_box.width)
+        y2 = np.minimum(self.y + self.height, boundary_box.y + boundary_box.height)
+        data = self.data.copy()
+        data['x'], data['y'], data['width'], data['height'] = x1, y1, x2 - x1, y2 - y1
+        keep = (data['width'] > 0) & (data['height'] > 0)
+        return BoxList(data=data[keep], names=self.names[keep])
+
+    def offset(self, x_offset=0, y_offset=0) -> 'BoxList':
+        data = self.data.copy()
+        data['x'] += x_offset
+        data['y'] += y_offset
+        return BoxList(data=data, names=self.names)
+
+    def name_mask(self, names) -> np.ndarray:
+        """
+        Boolean mask of the boxes whose name equals one of the strings or matches one of the regex patterns.
+        """
+        return self._name_priorities(names) >= 0
+
+    def _name_priorities(self, names) -> np.ndarray:
+        # the priority of each box name, -1 if it does not match, computed once per distinct name
+        matcher = get_name_matcher(names)
+        found = {}
+        for box_name in set(self.names.tolist()):
+            priority = matcher.priority(box_name)
+            found[box_name] = -1 if priority is None else priority
+        return np.fromiter((found[box_name] for box_name in self.names), dtype=np.int64, count=len(self.names))
+
+    def by_name(self, names) -> 'BoxList':
+        return self.filter(self.name_mask(names))
+
+    def first_by_name(self, names) -> Box | None:
+        """
+        The first box matching the name with the lowest index in names, same as find_box_by_name.
+        """
+        priorities = self._name_priorities(names)
+        matched = priorities >= 0
+        if not matched.any():
+            return None
+        best = priorities[matched].min()
+        return self._box(int(np.argmax(priorities == best)))
+
+    def average_width(self) -> int:
+        return int(self.width.sum() / len(self.data)) if len(self.data) else 0
+
+
+def _new_box(x, y, width, height, confidence, name) -> Box:
+    # skip the rounding and validation of Box.__init__, the values come from valid boxes
+    box = Box.__new__(Box)
+    box.x, box.y, box.width, box.height, box.confidence, box.name = x, y, width, height, confidence, name
+    return box
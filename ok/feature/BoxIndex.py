@@ -0,0 +1,138 @@
+import math
+from collections import defaultdict
+
+
+class BoxIndex:
+    def __init__(self, boxes, cell_size=0) -> None:
+        """
+        A uniform grid over a list of boxes for nearest neighbour, containment and overlap queries that only look at
+        the cells around the query instead of every box. Build it once per frame and query it many times.
+
+        Args:
+            boxes (list[Box]): The boxes to index, results are returned in the order of this list.
+            cell_size (int): Size of a grid cell in pixels, defaults to twice the average box size.
+        """
+        self.boxes = list(boxes)
+        if cell_size <= 0:
+            cell_size = 2 * sum(max(box.width, box.height) for box in self.boxes) / len(self.boxes) if self.boxes else 1
+        self.cell_size = max(1, round(cell_size))
+        # (cell_x, cell_y) to the indexes of the boxes touching the cell
+        self.cells = defaultdict(list)
+        for i, box in enumerate(self.boxes):
+            cx1, cy1, cx2, cy2 = self._cell_range(box)
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    self.cells[(cx, cy)].append(i)
+        if self.cells:
+            self.min_cx = min(cx for cx, _ in self.cells)
+            self.max_cx = max(cx for cx, _ in self.cells)
+            self.min_cy = min(cy for _, cy in self.cells)
+            self.max_cy = max(cy for _, cy in self.cells)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __iter__(self):
+        return iter(self.boxes)
+
+    def _cell_range(self, box):
+        size = self.cell_size
+        return box.x // size, box.y // size, (box.x + box.width) // size, (box.y + box.height) // size
+
+    def _candidates(self, box):
+        cx1, cy1, cx2, cy2 = self._cell_range(box)
+        candidates = set()
+        for cx in range(max(cx1, self.min_cx), min(cx2, self.max_cx) + 1):
+            for cy in range(max(cy1, self.min_cy), min(cy2, self.max_cy) + 1):
+                candidates.update(self.cells.get((cx, cy), ()))
+        return sorted(candidates)
+
+    def within(self, boundary_box) -> list:
+        """
+        The boxes entirely within the boundary box, same as find_boxes_within_boundary.
+        """
+        if not self.cells:
+            return []
+        result = []
+        for i in self._candidates(boundary_box):
+            box = self.boxes[i]
+            if (box.x >= boundary_box.x and box.y >= boundary_box.y and
+                    box.x + box.width <= boundary_box.x + boundary_box.width and
+                    box.y + box.height <= boundary_box.y + boundary_box.height):
+                result.append(box)
+        return result
+
+    def overlapping(self, other) -> list:
+        """
+        The boxes sharing a non empty area with the other box.
+        """
+        if not self.cells:
+            return []
+        result = []
+        for i in self._candidates(other):
+            box = self.boxes[i]
+            if (box.x < other.x + other.width and other.x < box.x + box.width and
+                    box.y < other.y + other.height and other.y < box.y + box.height):
+                result.append(box)
+        return result
+
+    def closest(self, origin, direction='all', condition=None):
+        """
+        The closest box in the direction, same semantics as Box.find_closest_box: gap distance between the edges,
+        'up', 'down', 'left', 'right' or 'all', boxes equal to the origin are skipped and ties go to the box first in
+        the list.
+
+        The cells are searched in rings around the origin, stopping as soon as no box of an outer ring can be closer.
+        """
+        if not self.cells:
+            return None
+        orig_x, orig_y, orig_w, orig_h = origin.x, origin.y, origin.width, origin.height
+
+        def distance(box):
+            if box == origin:
+                return math.inf
+            if direction == 'up' and orig_y - (box.y + box.height / 2) < 0:
+                return math.inf
+            if direction == 'down' and box.y - (orig_y + orig_h / 2) < 0:
+                return math.inf
+            if direction == 'left' and orig_x - (box.x + box.width / 2) < 0:
+                return math.inf
+            if direction == 'right' and box.x - (orig_x + orig_w / 2) < 0:
+                return math.inf
+            if direction not in ('up', 'down', 'left', 'right', 'all'):
+                return math.inf
+            if condition is not None and not condition(box):
+                return math.inf
+            dx = max(orig_x - (box.x + box.width), box.x - (orig_x + orig_w), 0)
+            dy = max(orig_y - (box.y + box.height), box.y - (orig_y + orig_h), 0)
+            return math.sqrt(dx ** 2 + dy ** 2)
+
+        cx1, cy1, cx2, cy2 = self._cell_range(origin)
+        max_ring = max(cx1 - self.min_cx, self.max_cx - cx2, cy1 - self.min_cy, self.max_cy - cy2, 0)
+        best = (math.inf, -1)
+        seen = set()
+        for ring in range(max_ring + 1):
+            for cell in ring_cells(cx1 - ring, cy1 - ring, cx2 + ring, cy2 + ring, ring == 0):
+                for i in self.cells.get(cell, ()):
+                    if i not in seen:
+                        seen.add(i)
+                        best = min(best, (distance(self.boxes[i]), i))
+            # boxes not seen yet are in cells at least ring + 1 away, more than ring cells from the origin
+            if best[0] < ring * self.cell_size:
+                break
+        return self.boxes[best[1]] if best[0] != math.inf else None
+
+
+def ring_cells(cx1, cy1, cx2, cy2, fill):
+    # the border cells of the rectangle, or all of its cells if fill
+    if fill:
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                yield cx, cy
+        return
+    for cx in range(cx1, cx2 + 1):
+        yield cx, cy1
+        yield cx, cy2
+    for cy in range(cy1 + 1, cy2):
+        yield cx1, cy
+        yield cx2, cy
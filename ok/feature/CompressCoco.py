@@ -1,65 +1,144 @@
+import hashlib
 import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 import cv2
 import numpy as np
 from PIL import Image
 from PIL.PngImagePlugin import PngInfo
 
-from ok.feature.FeatureSet import read_from_json
+from ok.feature.TemplateAtlas import build_atlas
+from ok.logging.Logger import get_logger
 
+logger = get_logger(__name__)
 
-def compress_coco(coco_json) -> None:
-    feature_dict, *_ = read_from_json(coco_json)
+# bump when the compressed output changes, forces every image to be compressed again
+MANIFEST_VERSION = 1
+
+
+def compress_coco(coco_json, atlas=False, max_workers=None) -> None:
+    """
+    Replace every image of the COCO dataset by a PNG that only keeps the annotated features on a white background.
+
+    Only the images whose file or annotations changed since the last run, according to the manifest written next to
+    the coco json, are compressed again. The PNG encoding runs on a process pool.
+
+    Args:
+        coco_json (str): The COCO json file.
+        atlas (bool): Also build the memory mapped template atlas.
+        max_workers (int): Max number of processes used to encode the images, defaults to the cpu count.
+    """
+    start = time.time()
     with open(coco_json, 'r') as file:
-        image_dict = {}
         data = json.load(file)
-        coco_folder = os.path.dirname(coco_json)
-        image_map = {image['id']: image['file_name'] for image in data['images']}
-        category_map = {category['id']: category['name'] for category in data['categories']}
-
-        for annotation in data['annotations']:
-            image_id = annotation['image_id']
-            category_id = annotation['category_id']
-
-            feature = feature_dict.get(category_map[category_id])
-            if feature:
-                # Load and scale the image
-                image_path = str(os.path.join(coco_folder, image_map[image_id]))
-                image_features = image_dict.get(image_path, [])
-                image_features.append(feature)
-                image_dict[image_path] = image_features
-
-        # Loop through the image_dict and write all the image_feature associated with it in a new PNG
-        for image_path, features in image_dict.items():
-            background = None
-            for feature in features:
-                # Create a white background
-                if background is None:
-                    original_image = cv2.imread(image_path)
-                    background = np.full_like(original_image,
-                                              255)  # Create white background with the same shape as original_image
-
-                # Paste the feature onto the background
-                x, y = feature.x, feature.y
-                h, w = feature.mat.shape[:2]
-                background[y:y + h, x:x + w] = feature.mat
-
-            # Save the image with metadata
-            save_image_with_metadata(background, image_path)
-
-        replaced = False
-        for image in data['images']:
-            image['file_name'], replaced = replace_extension(image['file_name'])
-
-        if replaced:
-            with open(coco_json, 'w') as json_file:
-                json.dump(data, json_file, indent=4)
+    coco_folder = os.path.dirname(coco_json)
+    manifest_file = os.path.splitext(coco_json)[0] + '.compress.json'
+    manifest = load_manifest(manifest_file)
+    category_map = {category['id']: category['name'] for category in data['categories']}
+
+    bboxes_by_image = {image['id']: [] for image in data['images']}
+    for annotation in data['annotations']:
+        if not category_map[annotation['category_id']].startswith('box_'):
+            bboxes_by_image[annotation['image_id']].append(annotation['bbox'])
+
+    images = {}
+    jobs = []
+    for image in data['images']:
+        bboxes = sorted(bboxes_by_image[image['id']])
+        annotation_hash = hashlib.md5(json.dumps(bboxes).encode()).hexdigest()
+        entry = manifest.get(image['file_name'])
+        image_path = os.path.join(coco_folder, image['file_name'])
+        if not os.path.exists(image_path):
+            logger.error(f'compress_coco image not found {image_path}')
+            continue
+        if entry and entry['annotations'] == annotation_hash and entry['source'] == file_hash(image_path):
+            continue
+        images[image_path] = (image, annotation_hash)
+        if bboxes:
+            jobs.append((image_path, bboxes))
+
+    if jobs:
+        if len(jobs) == 1:
+            results = [compress_image(*jobs[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(compress_image, *zip(*jobs)))
+        for image_path, new_path in zip([job[0] for job in jobs], results):
+            if new_path is None:
+                logger.error(f'compress_coco could not read image {image_path}')
+                images.pop(image_path)
+
+    compressed = {job[0] for job in jobs}
+    replaced = False
+    for image_path, (image, annotation_hash) in images.items():
+        if image_path in compressed:
+            image['file_name'], image_replaced = replace_extension(image['file_name'])
+            replaced = replaced or image_replaced
+        new_path = os.path.join(coco_folder, image['file_name'])
+        manifest[image['file_name']] = {'source': file_hash(new_path), 'annotations': annotation_hash}
+
+    if replaced:
+        with open(coco_json, 'w') as json_file:
+            json.dump(data, json_file, indent=4)
+    if images:
+        file_names = {image['file_name'] for image in data['images']}
+        save_manifest(manifest_file, {name: entry for name, entry in manifest.items() if name in file_names})
+    logger.info(f'compress_coco {len(jobs)} of {len(data["images"])} images compressed in {time.time() - start:.3f}s')
+
+    if atlas:
+        build_atlas(coco_json)
+
+
+def compress_image(image_path, bboxes):
+    """
+    Paste the annotated features of one image on a white background and save it as a PNG, runs in a worker process.
+
+    Returns:
+        str: The path of the saved PNG, or None if the image could not be read.
+    """
+    original_image = cv2.imread(image_path)
+    if original_image is None:
+        return None
+    # Create white background with the same shape as original_image
+    background = np.full_like(original_image, 255)
+    for x, y, w, h in bboxes:
+        x1, y1 = round(x), round(y)
+        feature = original_image[y1:round(y + h), x1:round(x + w)]
+        background[y1:y1 + feature.shape[0], x1:x1 + feature.shape[1]] = feature
+    return save_image_with_metadata(background, image_path)
+
+
+def file_hash(path) -> str:
+    md5_hash = hashlib.md5()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            md5_hash.update(chunk)
+    return md5_hash.hexdigest()
+
+
+def load_manifest(manifest_file) -> dict:
+    if os.path.exists(manifest_file):
+        try:
+            with open(manifest_file, 'r') as file:
+                manifest = json.load(file)
+            if manifest.get('version') == MANIFEST_VERSION:
+                return manifest['images']
+        except Exception as e:
+            logger.error(f'load compress manifest error {manifest_file}', e)
+    return {}
+
+
+def save_manifest(manifest_file, images) -> None:
+    with open(manifest_file, 'w') as file:
+        json.dump({'version': MANIFEST_VERSION, 'images': images}, file, indent=4)
 
 
 def replace_extension(filename):
     if filename.endswith('.jpg'):
         return filename[:-4] + '.png', True
+    return filename, False
 
 
 def save_image_with_metadata(image, image_path):
@@ -77,4 +156,4 @@ def save_image_with_metadata(image, image_path):
         os.remove(image_path)
     # Save the image with metadata
     pil_image.save(new_path, 'PNG', optimize=True, pnginfo=metadata)
-    return image_path
+    return new_path
@@ -1,5 +1,8 @@
+import cv2
 import numpy as np
 
+from ok.color.Color import rgb_to_gray
+
 
 class Feature:
     def __init__(self, mat: np.ndarray, x: int = 0, y: int = 0, scaling=1) -> None:
@@ -18,6 +21,10 @@ class Feature:
         self.x = round(x)
         self.y = round(y)
         self.mask = None
+        # preprocessed templates and masks, keyed by the preprocessing parameters
+        self._variants = {}
+        # the last mask_function mask per preprocessing, replaced when another function is passed
+        self._function_masks = {}
 
     @property
     def width(self):
@@ -30,5 +37,67 @@ class Feature:
     def scaling(self):
         return self.scaling
 
+    def nbytes(self) -> int:
+        """
+        Memory used by the template and its preprocessed variants.
+        """
+        return (self.mat.nbytes + sum(variant.nbytes for variant in self._variants.values() if variant is not None) +
+                sum(mask.nbytes for _, mask in self._function_masks.values() if mask is not None))
+
+    def get_mat(self, use_gray_scale=False, canny_lower=0, canny_higher=0) -> np.ndarray:
+        """
+        The template preprocessed the same way as the search area, the original mat is never modified.
+        """
+        key = variant_key(use_gray_scale, canny_lower, canny_higher)
+        if key is None:
+            return self.mat
+        mat = self._variants.get(key)
+        if mat is None:
+            mat = self.mat if len(self.mat.shape) == 2 else cv2.cvtColor(self.mat, cv2.COLOR_BGR2GRAY)
+            if key[0] == 'canny':
+                mat = cv2.Canny(mat, canny_lower, canny_higher)
+            self._variants[key] = mat
+        return mat
+
+    def get_mask(self, use_gray_scale=False, canny_lower=0, canny_higher=0, inverse_mask_color=None,
+                 mask_function=None) -> np.ndarray | None:
+        """
+        The mask of the preprocessed template, a mask assigned to self.mask takes precedence.
+        A mask_function mask is only reused while the same function object is passed, one is kept per preprocessing,
+        so pass a function defined once rather than a new lambda on every call.
+        """
+        if self.mask is not None:
+            return self.mask
+        if inverse_mask_color is None and mask_function is None:
+            return None
+        preprocess_key = variant_key(use_gray_scale, canny_lower, canny_higher)
+        if inverse_mask_color is None:
+            cached = self._function_masks.get(preprocess_key)
+            if cached is None or cached[0] is not mask_function:
+                cached = mask_function, mask_function(self.get_mat(use_gray_scale, canny_lower, canny_higher))
+                self._function_masks[preprocess_key] = cached
+            return cached[1]
+        key = ('mask', preprocess_key, tuple(inverse_mask_color))
+        if key not in self._variants:
+            mat = self.get_mat(use_gray_scale, canny_lower, canny_higher)
+            if len(mat.shape) == 2:
+                gray_mask_color = rgb_to_gray(inverse_mask_color)
+                mask = cv2.compare(mat, gray_mask_color, cv2.CMP_NE)
+            else:
+                bound = np.array([inverse_mask_color[0], inverse_mask_color[1], inverse_mask_color[2]],
+                                 dtype=np.uint8)
+                mask = cv2.inRange(mat, bound, bound)
+                mask = cv2.bitwise_not(mask)
+            self._variants[key] = mask
+        return self._variants[key]
+
     def __str__(self) -> str:
         return f'self.x: {self.x}, self.y: {self.y}, width: {self.width}, height: {self.height}'
+
+
+def variant_key(use_gray_scale=False, canny_lower=0, canny_higher=0):
+    if canny_lower != 0 and canny_higher != 0:
+        return 'canny', canny_lower, canny_higher
+    if use_gray_scale:
+        return 'gray',
+    return None
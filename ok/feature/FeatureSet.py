@@ -2,6 +2,9 @@ import json
 import math
 import os
 import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
 from typing import List
 
@@ -9,24 +12,30 @@ import cv2
 import numpy as np
 from PIL import Image
 
-from ok.color.Color import rgb_to_gray
 from ok.feature.Box import Box, sort_boxes
 from ok.feature.Feature import Feature
+from ok.feature.RoiTracker import RoiTracker
+from ok.feature.TemplateCache import TemplateCache
 from ok.gui.Communicate import communicate
 from ok.logging.Logger import get_logger
-from ok.util.path import resource_path
+from ok.util.FrameCache import FrameCache
+from ok.util.LruCache import LruCache, content_hash
+from ok.util.path import resource_path, get_path_relative_to_exe
 
 logger = get_logger(__name__)
 
+# search areas with fewer pixels are not worth splitting across threads
+PARALLEL_MIN_PIXELS = 400_000
+
 
 class FeatureSet:
-    # Category_name to OpenCV Mat
-    feature_dict: Dict[str, Feature] = {}
-    box_dict: Dict[str, Box] = {}
-    load_success = False
 
     def __init__(self, debug, coco_json: str, default_horizontal_variance=0,
-                 default_vertical_variance=0, default_threshold=0.95) -> None:
+                 default_vertical_variance=0, default_threshold=0.95, pyramid_scale=0.5,
+                 cache_folder='cache/features', track_margin=0.01, match_cache_size=256,
+                 match_cache_max_bytes=1024 * 1024, use_atlas=False, engine='template',
+                 keypoint_categories=None, resolution_cache_size=4, resolution_cache_mb=256,
+                 keypoint_threshold=0.25, keypoint_variance=1.0) -> None:
         """
         Initialize the FeatureSet by loading images and annotations from a COCO dataset.
 
@@ -34,9 +43,30 @@ class FeatureSet:
             coco_json (str): Directory containing the JSON file and images.
             width (int): Scale images to this width.
             height (int): Scale images to this height.
+            pyramid_scale (float): Downscale factor of the coarse pass when find_feature is called with use_pyramid,
+                rounded to 1 / an integer step.
+            cache_folder (str): Folder of the on-disk cache of scaled templates, relative to the exe, None to disable.
+            track_margin (float): Margin of the tracked window around the last hit as a percentage of the width.
+            match_cache_size (int): Max entries of the match result cache keyed by the search area content, 0 to disable.
+            match_cache_max_bytes (int): Memory cap of the match result cache.
+            use_atlas (bool): Load the templates from the memory mapped atlas built by compress_coco.
+            engine (str): 'template' or 'keypoint', the default matching engine of every category.
+            keypoint_categories (list): Categories matched with the keypoint engine whatever the default engine.
+            resolution_cache_size (int): Number of resolutions whose loaded templates are kept in memory, so
+                switching back to a recent resolution does not reload them, 0 to disable.
+            resolution_cache_mb (int): Memory cap of the templates kept for the recent resolutions in MB.
+            keypoint_threshold (float): Default min inlier ratio of a keypoint engine hit, used instead of
+                default_threshold when find_feature is called without a threshold.
+            keypoint_variance (float): Search area of the keypoint engine around the scaled position, as a percentage
+                of the frame size, used when find_feature is called without an area. The default 1 searches the whole
+                frame, since the scaled position is off on non standard aspect ratios.
         """
         self.coco_json = resource_path(coco_json)
         self.debug = debug
+        # Category_name to OpenCV Mat, of the current resolution
+        self.feature_dict: Dict[str, Feature] = {}
+        self.box_dict: Dict[str, Box] = {}
+        self.load_success = False
 
         logger.debug(f'Loading features from {self.coco_json}')
 
@@ -48,6 +78,20 @@ class FeatureSet:
         self.default_threshold = default_threshold
         self.default_horizontal_variance = default_horizontal_variance
         self.default_vertical_variance = default_vertical_variance
+        self.pyramid_scale = pyramid_scale
+        self.use_atlas = use_atlas
+        self.engine = engine
+        self.keypoint_categories = set(keypoint_categories or [])
+        self.keypoint_threshold = keypoint_threshold
+        self.keypoint_variance = keypoint_variance
+        # descriptors are computed at the original resolution once, kept across resolution changes
+        self.keypoint_matcher = None
+        self.tracker = RoiTracker(track_margin)
+        self.match_cache = LruCache(match_cache_size, match_cache_max_bytes)
+        # (width, height) to (feature_dict, box_dict) of the recently used resolutions
+        self.resolution_cache = LruCache(resolution_cache_size, resolution_cache_mb * 1024 * 1024)
+        self.template_cache = TemplateCache(self.coco_json,
+                                            get_path_relative_to_exe(cache_folder)) if cache_folder else None
         self.lock = threading.Lock()
 
     def feature_exists(self, feature_name: str) -> bool:
@@ -63,7 +107,15 @@ class FeatureSet:
                 logger.info(f"FeatureSet: Width and height changed from {self.width}x{self.height} to {width}x{height}")
                 self.width = width
                 self.height = height
-                self.process_data()
+                self.tracker.clear()
+                self.match_cache.clear()
+                cached = self.resolution_cache.get((width, height))
+                if cached is not None:
+                    logger.info(f'FeatureSet: reuse the templates of {width}x{height} loaded before')
+                    self.feature_dict, self.box_dict = cached
+                    self.load_success = True
+                else:
+                    self.process_data()
             elif not self.feature_dict:
                 self.process_data()
         return self.load_success
@@ -76,16 +128,64 @@ class FeatureSet:
             width (int): Target width for scaling images.
             height (int): Target height for scaling images.
         """
-        self.feature_dict, self.box_dict, compressed, self.load_success = read_from_json(self.coco_json, self.width,
-                                                                                         self.height)
+        if self.template_cache is not None:
+            cached = self.template_cache.load(self.width, self.height)
+            if cached is not None:
+                self.feature_dict, self.box_dict, compressed = cached
+                self.load_success = True
+                self.cache_resolution()
+                return self.load_success
+        self.feature_dict, self.box_dict, compressed, self.load_success = self.read_features()
         if self.debug and not compressed:
             from ok.feature.CompressCoco import compress_coco
             logger.info(f'coco not compressed try to compress the COCO dataset')
-            compress_coco(self.coco_json)
-            self.feature_dict, self.box_dict, compressed, self.load_success = read_from_json(self.coco_json, self.width,
-                                                                                             self.height)
+            compress_coco(self.coco_json, atlas=self.use_atlas)
+            self.feature_dict, self.box_dict, compressed, self.load_success = self.read_features()
+        if self.template_cache is not None and self.load_success:
+            self.template_cache.save(self.width, self.height, self.feature_dict, self.box_dict, compressed)
+        if self.load_success:
+            self.cache_resolution()
         return self.load_success
 
+    def cache_resolution(self) -> None:
+        # the preprocessed variants are created later, count the gray one up front
+        size = sum(feature.nbytes() + feature.width * feature.height for feature in self.feature_dict.values())
+        self.resolution_cache.put((self.width, self.height), (self.feature_dict, self.box_dict), size)
+
+    def read_features(self):
+        if self.use_atlas:
+            from ok.feature.TemplateAtlas import read_from_atlas, build_atlas
+            loaded = read_from_atlas(self.coco_json, self.width, self.height)
+            if loaded is None and self.debug:
+                build_atlas(self.coco_json)
+                loaded = read_from_atlas(self.coco_json, self.width, self.height)
+            if loaded is not None:
+                return loaded
+            logger.warning(f'no up to date template atlas for {self.coco_json}, reading the COCO images')
+        return read_from_json(self.coco_json, self.width, self.height)
+
+    def get_keypoint_matcher(self):
+        with self.lock:
+            if self.keypoint_matcher is None:
+                from ok.feature.KeypointMatcher import KeypointMatcher
+                keypoint_matcher = KeypointMatcher()
+                feature_dict, *_ = read_from_json(self.coco_json)
+                if self.engine != 'keypoint':
+                    feature_dict = {name: feature for name, feature in feature_dict.items() if
+                                    name in self.keypoint_categories}
+                keypoint_matcher.add_templates(feature_dict)
+                self.keypoint_matcher = keypoint_matcher
+            return self.keypoint_matcher
+
+    def use_keypoints(self, category_name) -> bool:
+        """
+        Whether the category is matched with the keypoint engine, categories with too few keypoints fall back to
+        template matching.
+        """
+        if self.engine != 'keypoint' and category_name not in self.keypoint_categories:
+            return False
+        return self.get_keypoint_matcher().supports(category_name)
+
     def get_box_by_name(self, mat, category_name: str) -> Box:
         self.check_size(mat)
         if category_name in self.box_dict:
@@ -123,13 +223,23 @@ class FeatureSet:
     #     if len(boxes) >= 1:
     #         return boxes[0]
 
+    def tracker_stats(self) -> dict:
+        return self.tracker.stats()
+
+    def match_cache_stats(self) -> dict:
+        return self.match_cache.stats()
+
+    def resolution_cache_stats(self) -> dict:
+        return self.resolution_cache.stats()
+
     def get_feature_by_name(self, name):
         return self.feature_dict.get(name)
 
     def find_feature(self, mat: np.ndarray, category_name: str, horizontal_variance: float = 0,
                      vertical_variance: float = 0, threshold: float = 0, use_gray_scale: bool = False, x=-1, y=-1,
                      to_x=-1, to_y=-1, width=-1, height=-1, box=None, canny_lower=0, canny_higher=0,
-                     inverse_mask_color=None, frame_processor=None, template=None, mask_function=None) -> List[Box]:
+                     inverse_mask_color=None, frame_processor=None, template=None, mask_function=None,
+                     use_pyramid=False, frame_cache=None, pool=None, track=False) -> List[Box]:
         """
         Find a feature within a given variance.
 
@@ -138,14 +248,112 @@ class FeatureSet:
             category_name (str): The category name of the feature to find.
             horizontal_variance (float): Allowed horizontal variance as a percentage of width.
             vertical_variance (float): Allowed vertical variance as a percentage of height.
-            threshold (float): Allowed confidence threshold for the feature.
+            threshold (float): Allowed confidence threshold for the feature. For the keypoint engine the confidence is
+                the RANSAC inlier ratio, and keypoint_threshold is used when no threshold is given.
             use_gray_scale (bool): If True, convert image to grayscale before finding the feature.
+            mask_function (callable): Builds the template mask from the preprocessed template. The mask is only
+                reused while the same function object is passed, a new lambda per call rebuilds it every time.
+            use_pyramid (bool): If True, match a downscaled template first and refine only around the coarse
+                candidates at full resolution. Faster on large search areas, same boxes, confidences equal up to the
+                float error of matching a window instead of the whole area.
+            frame_cache (FrameCache): If given, the grayscale search area is taken from it, the whole frame is only
+                converted and shared when the area is a large share of it.
+            pool (ThreadPoolExecutor): If given, large search areas are split in strips matched in parallel.
+            track (bool): If True, search a tight window around the last hit first and only widen to the whole
+                search area when it misses. Meant for features that show up once and rarely move.
 
         Returns:
             List[Box]: A list of boxes where the feature is found.
         """
         self.check_size(mat)
+        boxes, search_box = self._find_feature(mat, category_name, horizontal_variance, vertical_variance, threshold,
+                                               use_gray_scale, x, y, to_x, to_y, width, height, box, canny_lower,
+                                               canny_higher, inverse_mask_color, frame_processor, template,
+                                               mask_function, use_pyramid, frame_cache, pool, track=track)
+        communicate.emit_draw_box(category_name, boxes, "red")
+        communicate.emit_draw_box(search_box.name, search_box, "blue")
+        return boxes
+
+    def find_best(self, mat: np.ndarray, category_name: str, horizontal_variance: float = 0,
+                  vertical_variance: float = 0, threshold: float = 0, use_gray_scale: bool = False, box=None,
+                  canny_lower=0, canny_higher=0, inverse_mask_color=None, frame_processor=None, template=None,
+                  mask_function=None, use_pyramid=False, frame_cache=None, pool=None, track=False) -> Box | None:
+        """
+        Find the single highest confidence match of a feature.
 
+        Same search area and preprocessing as find_feature, but the match result is reduced with cv2.minMaxLoc,
+        skipping the candidate enumeration and the non-maximum suppression.
+
+        Returns:
+            Box: The best match above the threshold, or None.
+        """
+        self.check_size(mat)
+        boxes, search_box = self._find_feature(mat, category_name, horizontal_variance, vertical_variance, threshold,
+                                               use_gray_scale, box=box, canny_lower=canny_lower,
+                                               canny_higher=canny_higher, inverse_mask_color=inverse_mask_color,
+                                               frame_processor=frame_processor, template=template,
+                                               mask_function=mask_function, use_pyramid=use_pyramid,
+                                               frame_cache=frame_cache, pool=pool, best_only=True, track=track)
+        communicate.emit_draw_box(category_name, boxes, "red")
+        communicate.emit_draw_box(search_box.name, search_box, "blue")
+        return boxes[0] if boxes else None
+
+    def find_features(self, mat: np.ndarray, specs: list, frame_cache=None, pool=None) -> Dict[str, List[Box]]:
+        """
+        Find multiple features in the same frame in one call.
+
+        The size check is done once for the whole batch instead of once per feature, and the grayscale conversion is
+        shared through a frame cache.
+
+        Args:
+            mat (np.ndarray): The image in which to find the features.
+            specs (list): Category names, or dicts with a 'name' key plus any keyword argument of find_feature
+                except frame_cache and pool, which apply to the whole batch,
+                e.g. ['start', {'name': 'ok_button', 'threshold': 0.9, 'use_gray_scale': True}].
+            frame_cache (FrameCache): If given, the grayscale search area is taken from it, the whole frame is only
+                converted and shared when the area is a large share of it.
+            pool (ThreadPoolExecutor): If given, the features are matched in parallel on it.
+
+        Returns:
+            Dict[str, List[Box]]: The boxes found for each category name.
+        """
+        self.check_size(mat)
+        if frame_cache is None:
+            # still share the grayscale conversion between the features of the batch
+            frame_cache = FrameCache()
+        jobs = []
+        for spec in specs:
+            if isinstance(spec, str):
+                spec = {'name': spec}
+            options = dict(spec)
+            category_name = options.pop('name')
+            batch_options = [key for key in ('frame_cache', 'pool', 'best_only') if key in options]
+            if batch_options:
+                raise ValueError(f"FeatureSet: find_features spec of {category_name} can not set {batch_options}")
+            jobs.append((category_name, options))
+
+        if pool is not None and len(jobs) > 1:
+            # cv2.matchTemplate releases the GIL, one feature per worker, no nested strip splitting
+            futures = [pool.submit(self._find_feature, mat, category_name, frame_cache=frame_cache, **options)
+                       for category_name, options in jobs]
+            found = [future.result() for future in futures]
+        else:
+            found = [self._find_feature(mat, category_name, frame_cache=frame_cache, pool=pool, **options)
+                     for category_name, options in jobs]
+
+        results = {}
+        for (category_name, _), (boxes, search_box) in zip(jobs, found):
+            results[category_name] = boxes
+            communicate.emit_draw_box(category_name, boxes, "red")
+            communicate.emit_draw_box(search_box.name, search_box, "blue")
+        return results
+
+    def _find_feature(self, mat: np.ndarray, category_name: str, horizontal_variance: float = 0,
+                      vertical_variance: float = 0, threshold: float = 0, use_gray_scale: bool = False, x=-1, y=-1,
+                      to_x=-1, to_y=-1, width=-1, height=-1, box=None, canny_lower=0, canny_higher=0,
+                      inverse_mask_color=None, frame_processor=None, template=None, mask_function=None,
+                      use_pyramid=False, frame_cache=None, pool=None, best_only=False, track=False):
+        keypoint_threshold = threshold if threshold != 0 else self.keypoint_threshold
         if threshold == 0:
             threshold = self.default_threshold
         if horizontal_variance == 0:
@@ -156,6 +364,7 @@ class FeatureSet:
             raise ValueError(f"FeatureSet: " + category_name + " not found in featureDict")
         feature = self.feature_dict[category_name] if template is None else template
         feature_width, feature_height = feature.width, feature.height
+        use_keypoints = template is None and self.use_keypoints(category_name)
         if box is not None:
             search_x1 = box.x
             search_y1 = box.y
@@ -182,67 +391,106 @@ class FeatureSet:
                 if vertical_variance == 0:
                     y_offset = 1
 
+            if use_keypoints:
+                # keypoints do not depend on the scaled position, which is off on other aspect ratios, look further
+                x_offset = max(x_offset, self.width * self.keypoint_variance) + feature_width
+                y_offset = max(y_offset, self.height * self.keypoint_variance) + feature_height
+
             search_x1 = max(0, round(feature.x - x_offset))
             search_y1 = max(0, round(feature.y - y_offset))
             search_x2 = min(self.width, round(feature.x + feature_width + x_offset))
             search_y2 = min(self.height, round(feature.y + feature_height + y_offset))
 
-        search_area = mat[search_y1:search_y2, search_x1:search_x2, :3]
-
-        # Crop the search area from the image
-
-        if use_gray_scale:
-            search_area = cv2.cvtColor(search_area, cv2.COLOR_BGR2GRAY)
-            if len(feature.mat.shape) != 2:
-                feature.mat = cv2.cvtColor(feature.mat, cv2.COLOR_BGR2GRAY)
-        if canny_lower != 0 and canny_higher != 0:
-            if len(search_area.shape) != 2:
+        use_canny = canny_lower != 0 and canny_higher != 0
+        feature_mat = feature.get_mat(use_gray_scale, canny_lower, canny_higher)
+        feature_mask = feature.get_mask(use_gray_scale, canny_lower, canny_higher, inverse_mask_color, mask_function)
+
+        def match_area(x1, y1, x2, y2):
+            # the same pixels with the same options always give the same boxes, static screens hit the cache
+            cache_key = None
+            if self.match_cache.enabled and template is None:
+                cache_key = (category_name, x1, y1, x2, y2, threshold, use_gray_scale, canny_lower, canny_higher,
+                             tuple(inverse_mask_color) if inverse_mask_color is not None else None, mask_function,
+                             frame_processor, use_pyramid, best_only, content_hash(mat[y1:y2, x1:x2, :3]))
+                cached = self.match_cache.get(cache_key)
+                if cached is not None:
+                    return [cached_box.copy() for cached_box in cached]
+            found = search_area_boxes(x1, y1, x2, y2)
+            if cache_key is not None:
+                self.match_cache.put(cache_key, [found_box.copy() for found_box in found], 256 + 128 * len(found))
+            return found
+
+        def search_area_boxes(x1, y1, x2, y2):
+            # Crop the search area from the image, the frame cache converts only the crop unless the area is large
+            if frame_cache is not None and (use_gray_scale or use_canny):
+                search_area = frame_cache.gray_area(mat, x1, y1, x2, y2)
+            else:
+                search_area = mat[y1:y2, x1:x2, :3]
+
+            if (use_gray_scale or use_canny) and len(search_area.shape) != 2:
                 search_area = cv2.cvtColor(search_area, cv2.COLOR_BGR2GRAY)
-            search_area = cv2.Canny(search_area, canny_lower, canny_higher)
-            if len(feature.mat.shape) != 2:
-                feature.mat = cv2.cvtColor(feature.mat, cv2.COLOR_BGR2GRAY)
-                feature.mat = cv2.Canny(feature.mat, canny_lower, canny_higher)
-        if feature.mask is None:
-            if inverse_mask_color is not None:
-                if len(feature.mat.shape) == 2:
-                    gray_mask_color = rgb_to_gray(inverse_mask_color)
-                    feature.mask = cv2.compare(feature.mat, gray_mask_color, cv2.CMP_NE)
-                else:
-                    bound = np.array([inverse_mask_color[0], inverse_mask_color[1], inverse_mask_color[2]],
-                                     dtype=np.uint8)
-                    feature.mask = cv2.inRange(feature.mat, bound, bound)
-                    feature.mask = cv2.bitwise_not(feature.mask)
-            elif mask_function is not None:
-                feature.mask = mask_function(feature.mat)
-
-        if frame_processor is not None:
-            search_area = frame_processor(search_area)
+            if use_canny:
+                search_area = cv2.Canny(search_area, canny_lower, canny_higher)
+
+            if frame_processor is not None:
+                search_area = frame_processor(search_area)
+
+            if use_keypoints:
+                found_box = self.keypoint_matcher.match(search_area, category_name, x1, y1)
+                if found_box is None or found_box.confidence < keypoint_threshold:
+                    return []
+                return [found_box]
+
+            if use_pyramid:
+                result = match_template_pyramid(search_area, feature_mat, feature_mask, threshold, self.pyramid_scale)
+            elif pool is not None:
+                result = match_template_parallel(search_area, feature_mat, feature_mask, pool)
+            else:
+                result = cv2.matchTemplate(search_area, feature_mat, cv2.TM_CCOEFF_NORMED, mask=feature_mask)
+
+            # Define a threshold for acceptable matches
+            if best_only:
+                location = best_match(result, threshold)
+                locations = [location] if location is not None else []
+            else:
+                locations = filter_and_sort_matches(result, threshold, feature_width, feature_height)
+            found = []
+
+            for loc in locations:  # Iterate through found locations
+                found_x, found_y = loc[0][0] + x1, loc[0][1] + y1
+                confidence = 1.0 if math.isinf(loc[1]) and loc[1] > 0 else loc[1]
+                found.append(Box(found_x, found_y, feature_width, feature_height, confidence, category_name))
+            return found
 
-        result = cv2.matchTemplate(search_area, feature.mat, cv2.TM_CCOEFF_NORMED, mask=feature.mask)
-
-        # Define a threshold for acceptable matches
-        locations = filter_and_sort_matches(result, threshold, feature_width, feature_height)
-        boxes = []
-
-        for loc in locations:  # Iterate through found locations
-            x, y = loc[0][0] + search_x1, loc[0][1] + search_y1
-            confidence = 1.0 if math.isinf(loc[1]) and loc[1] > 0 else loc[1]
-            boxes.append(Box(x, y, feature_width, feature_height, confidence, category_name))
-
-        boxes = sort_boxes(boxes)
-        communicate.emit_draw_box(category_name, boxes, "red")
         search_name = "search_" + category_name
-        communicate.emit_draw_box(search_name,
-                                  Box(search_x1, search_y1, search_x2 - search_x1, search_y2 - search_y1,
-                                      name=search_name), "blue")
-        return boxes
-
-
-def read_from_json(coco_json, width=-1, height=-1):
+        track = track and template is None
+        hit = None
+        if track:
+            # try a tight window around the last hit first, widen to the whole search area if it misses
+            window = self.tracker.window(category_name, self.width, search_x1, search_y1, search_x2, search_y2)
+            if window is not None:
+                boxes = match_area(*window)
+                hit = len(boxes) > 0
+                if hit:
+                    self.tracker.update(category_name, boxes, hit)
+                    window_x1, window_y1, window_x2, window_y2 = window
+                    search_box = Box(window_x1, window_y1, window_x2 - window_x1, window_y2 - window_y1,
+                                     name=search_name)
+                    return sort_boxes(boxes), search_box
+
+        boxes = match_area(search_x1, search_y1, search_x2, search_y2)
+        if track:
+            self.tracker.update(category_name, boxes, hit)
+        search_box = Box(search_x1, search_y1, search_x2 - search_x1, search_y2 - search_y1, name=search_name)
+        return sort_boxes(boxes), search_box
+
+
+def read_from_json(coco_json, width=-1, height=-1, max_workers=8):
     feature_dict = {}
     box_dict = {}
     ok_compressed = None
     load_success = True
+    start = time.time()
     with open(coco_json, 'r') as file:
         data = json.load(file)
     coco_folder = os.path.dirname(coco_json)
@@ -253,24 +501,31 @@ def read_from_json(coco_json, width=-1, height=-1):
     # Create a map from category ID to category name
     category_map = {category['id']: category['name'] for category in data['categories']}
 
-    for image_id, file_name in image_map.items():
-        # Load and scale the image
-        image_path = str(os.path.join(coco_folder, file_name))
-        if ok_compressed is None:
-            image = Image.open(image_path)
+    # Group the annotations by image ID once
+    annotations_by_image = defaultdict(list)
+    for annotation in data['annotations']:
+        annotations_by_image[annotation['image_id']].append(annotation)
+    parse_time = time.time()
+
+    image_paths = {image_id: str(os.path.join(coco_folder, file_name)) for image_id, file_name in image_map.items()}
+    if image_paths:
+        # only reads the png header, no pixel decoding
+        with Image.open(next(iter(image_paths.values()))) as image:
             ok_compressed = 'ok_compressed' in image.info.keys()
+
+    def load_image(image_id):
+        # decode, crop and resize one image, only the scaled crops are kept in memory
+        image_path = image_paths[image_id]
+        decode_start = time.time()
         whole_image = cv2.imread(image_path)
+        decode_end = time.time()
         if whole_image is None:
-            load_success = False
             logger.error(f'Could not read image {image_path}')
-            continue
+            return None, decode_end - decode_start, 0
         _, original_width = whole_image.shape[:2]
         image_height, image_width = whole_image.shape[:2]
-
-        for annotation in data['annotations']:
-            if image_id != annotation['image_id']:
-                continue
-
+        loaded = []
+        for annotation in annotations_by_image[image_id]:
             category_id = annotation['category_id']
             bbox = annotation['bbox']
             x, y, w, h = bbox
@@ -292,12 +547,29 @@ def read_from_json(coco_json, width=-1, height=-1):
 
             logger.debug(
                 f"loaded {category_name} resized width {width} / original_width:{original_width},scale_x:{width / original_width}")
-            if category_name in feature_dict:
-                raise ValueError(f"Multiple boxes found for category {category_name}")
-            if not category_name.startswith('box_'):
-                feature_dict[category_name] = Feature(image, x, y, scale)
-            box_dict[category_name] = Box(x, y, image.shape[1], image.shape[0], name=category_name)
-
+            loaded.append((category_name, image, x, y, scale))
+        return loaded, decode_end - decode_start, time.time() - decode_end
+
+    # cv2.imread and cv2.resize release the GIL, load the images in parallel
+    decode_time = resize_time = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(image_paths)))) as pool:
+        for loaded, image_decode_time, image_resize_time in pool.map(load_image, image_paths.keys()):
+            decode_time += image_decode_time
+            resize_time += image_resize_time
+            if loaded is None:
+                load_success = False
+                continue
+            for category_name, image, x, y, scale in loaded:
+                if category_name in feature_dict:
+                    raise ValueError(f"Multiple boxes found for category {category_name}")
+                if not category_name.startswith('box_'):
+                    feature_dict[category_name] = Feature(image, x, y, scale)
+                box_dict[category_name] = Box(x, y, image.shape[1], image.shape[0], name=category_name)
+
+    end = time.time()
+    logger.info(f'read_from_json {len(image_paths)} images {len(box_dict)} boxes in {end - start:.3f}s, '
+                f'parse: {parse_time - start:.3f}s load: {end - parse_time:.3f}s, '
+                f'decode: {decode_time:.3f}s crop and resize: {resize_time:.3f}s summed over threads')
     return feature_dict, box_dict, ok_compressed, load_success
 
 
@@ -344,30 +616,135 @@ def replace_extension(filename):
         return filename[:-4] + '.png', True
 
 
-def filter_and_sort_matches(result, threshold, w, h):
-    # Find all matches above the confidence threshold
-    loc = np.where(result >= threshold)
-    matches = list(zip(*loc[::-1]))  # Convert to (x, y) coordinates
-
-    # Get the match confidence scores
-    confidences = result[result >= threshold]
-
-    # Combine the coordinates and confidences, and sort by confidence in descending order
-    matches_with_confidence = sorted(zip(matches, confidences), key=lambda x: x[1], reverse=True)
+def match_template_pyramid(search_area, template, mask, threshold, scale=0.5, coarse_margin=0.2,
+                           min_template_size=8):
+    """
+    Coarse-to-fine cv2.matchTemplate with TM_CCOEFF_NORMED.
+
+    The template is downscaled by an integer step, round(1 / scale), and matched with a relaxed threshold against the
+    search area downscaled at every sampling phase, so one of the phases averages the same pixel blocks as the
+    template wherever the match is and half pixel misalignment can not hide it. Only a small window around every
+    coarse candidate is then matched at full resolution. The returned map has the shape of a full resolution match,
+    holds the exact full resolution scores inside the refined windows and -1 everywhere else, so it can be passed to
+    filter_and_sort_matches as is.
+
+    Falls back to a plain full resolution match when the template would be too small after downscaling.
+    """
+    template_height, template_width = template.shape[:2]
+    area_height, area_width = search_area.shape[:2]
+    result_width, result_height = area_width - template_width + 1, area_height - template_height + 1
+    step = round(1 / scale) if scale > 0 else 1
+    small_template_width, small_template_height = template_width // step, template_height // step
+    if (step < 2 or min(small_template_width, small_template_height) < min_template_size
+            or result_width <= step or result_height <= step):
+        return cv2.matchTemplate(search_area, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+
+    # the template is averaged in step x step blocks from its top left corner
+    small_template = cv2.resize(template[:small_template_height * step, :small_template_width * step],
+                                (small_template_width, small_template_height), interpolation=cv2.INTER_AREA)
+    small_mask = None
+    if mask is not None:
+        small_mask = cv2.resize(mask[:small_template_height * step, :small_template_width * step],
+                                (small_template_width, small_template_height), interpolation=cv2.INTER_NEAREST)
+
+    # full resolution locations worth refining, a match at (x, y) lines up with the phase (x % step, y % step)
+    candidates = np.zeros((result_height, result_width), dtype=np.uint8)
+    for offset_y in range(step):
+        for offset_x in range(step):
+            small_area_width = (area_width - offset_x) // step
+            small_area_height = (area_height - offset_y) // step
+            if small_area_width < small_template_width or small_area_height < small_template_height:
+                continue
+            small_area = cv2.resize(search_area[offset_y:offset_y + small_area_height * step,
+                                    offset_x:offset_x + small_area_width * step],
+                                    (small_area_width, small_area_height), interpolation=cv2.INTER_AREA)
+            coarse = cv2.matchTemplate(small_area, small_template, cv2.TM_CCOEFF_NORMED, mask=small_mask)
+            cv2.patchNaNs(coarse, -1)
+            ys, xs = np.nonzero(coarse >= threshold - coarse_margin)
+            candidates[ys * step + offset_y, xs * step + offset_x] = 1
+
+    result = np.full((result_height, result_width), -1, dtype=np.float32)
+    if not candidates.any():
+        return result
+    # refine a step around every candidate, the coarse peak can be off by a block
+    candidates = cv2.dilate(candidates, np.ones((2 * step + 1, 2 * step + 1), np.uint8))
+    _, _, stats, _ = cv2.connectedComponentsWithStats(candidates, connectivity=8)
+    for x1, y1, w, h, _ in stats[1:]:
+        x2, y2 = x1 + w, y1 + h
+        window = search_area[y1:y2 + template_height - 1, x1:x2 + template_width - 1]
+        result[y1:y2, x1:x2] = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+    return result
+
+
+def match_template_parallel(search_area, template, mask, pool, min_pixels=PARALLEL_MIN_PIXELS):
+    """
+    cv2.matchTemplate with TM_CCOEFF_NORMED, split in horizontal strips matched on the pool.
+
+    Every strip overlaps the next one by the template height - 1 rows, so the stacked result is identical to a single
+    full match. Search areas smaller than min_pixels are matched directly on the calling thread.
+    """
+    template_height = template.shape[0]
+    area_height, area_width = search_area.shape[:2]
+    result_height = area_height - template_height + 1
+    strips = min(os.cpu_count() or 1, result_height, area_height * area_width // min_pixels)
+    if strips <= 1:
+        return cv2.matchTemplate(search_area, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+    bounds = np.linspace(0, result_height, strips + 1, dtype=int)
+    futures = [pool.submit(cv2.matchTemplate, search_area[start:end + template_height - 1], template,
+                           cv2.TM_CCOEFF_NORMED, mask=mask)
+               for start, end in zip(bounds[:-1], bounds[1:])]
+    return np.vstack([future.result() for future in futures])
+
+
+def best_match(result, threshold):
+    """
+    The highest scoring location of a cv2.matchTemplate result.
+
+    Returns:
+        tuple: ((x, y), confidence) or None if the best score is below the threshold.
+    """
+    cv2.patchNaNs(result, -1)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    if max_val >= threshold:
+        return max_loc, max_val
+
+
+def filter_and_sort_matches(result, threshold, w, h, chunk=256):
+    """
+    Non-maximum suppression of a cv2.matchTemplate result.
+
+    The locations above the threshold are greedily selected by descending confidence, dropping every location
+    overlapping a selected w x h match, the same selection as comparing each candidate to every selected match.
+    The selected matches are painted on a suppression mask and the candidates are checked against it a chunk at a
+    time, so the cost scales with the number of matches plus the candidates divided by the chunk size.
+
+    Returns:
+        list: ((x, y), confidence) tuples sorted by confidence in descending order.
+    """
+    result = np.asarray(result)
+    # NaN never compares above the threshold
+    ys, xs = np.nonzero(result >= threshold)
+    if ys.size == 0:
+        return []
+    confidences = result[ys, xs]
+
+    # Sort by confidence descending, ties keep the row major order to stay deterministic
+    order = np.argsort(-confidences, kind='stable')
+    xs, ys, confidences = xs[order], ys[order], confidences[order]
 
-    # List to store selected matches
     selected_matches = []
-
-    def is_overlapping(match, selected):
-        x1, y1 = match
-        for (x2, y2), _ in selected:
-            if (x1 < x2 + w and x1 + w > x2 and y1 < y2 + h and y1 + h > y2):
-                return True
-        return False
-
-    # Select non-overlapping matches
-    for match, confidence in matches_with_confidence:
-        if not is_overlapping(match, selected_matches):
-            selected_matches.append((match, confidence))
+    suppressed = np.zeros(result.shape, dtype=bool)
+    start = 0
+    while start < len(xs):
+        stop = min(len(xs), start + chunk)
+        free = ~suppressed[ys[start:stop], xs[start:stop]]
+        if not free.any():
+            start = stop
+            continue
+        i = start + int(np.argmax(free))
+        x, y = xs[i], ys[i]
+        selected_matches.append(((x, y), confidences[i]))
+        suppressed[max(0, y - h + 1):y + h, max(0, x - w + 1):x + w] = True
+        start = i + 1
 
     return selected_matches
@@ -0,0 +1,120 @@
+import threading
+
+import cv2
+import numpy as np
+
+from ok.feature.Box import Box
+from ok.logging.Logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class KeypointMatcher:
+    def __init__(self, n_features=500, patch_size=15, ratio=0.75, min_keypoints=10, min_matches=8,
+                 min_inlier_ratio=0.25, max_search_features=10000) -> None:
+        """
+        Scale invariant alternative to template matching, ORB keypoints and descriptors are computed once per
+        template at its original resolution and matched against the search area with a brute force Hamming matcher,
+        the homography of the matches gives the box, so the same descriptors serve every resolution.
+
+        Args:
+            n_features (int): Max number of ORB keypoints per image.
+            patch_size (int): ORB patch size, images are padded by this so keypoints close to the border are kept.
+            ratio (float): Lowe's ratio test threshold.
+            min_keypoints (int): Templates with fewer keypoints are not supported and use template matching.
+            min_matches (int): Min number of good matches to estimate the homography, and of RANSAC inliers.
+            min_inlier_ratio (float): Min ratio of RANSAC inliers among the good matches for a hit.
+            max_search_features (int): Cap of the keypoints detected in a search area, which gets n_features per
+                template sized region so the template region keeps about as many keypoints as the template.
+        """
+        self.n_features = n_features
+        self.patch_size = patch_size
+        self.ratio = ratio
+        self.min_keypoints = min_keypoints
+        self.min_matches = min_matches
+        self.min_inlier_ratio = min_inlier_ratio
+        self.max_search_features = max_search_features
+        self.matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+        # category_name to (keypoint coordinates, descriptors, width, height)
+        self.templates = {}
+        self.local = threading.local()
+
+    def orb(self):
+        # cv2 detectors are not thread safe, one per thread
+        orb = getattr(self.local, 'orb', None)
+        if orb is None:
+            orb = cv2.ORB_create(nfeatures=self.n_features, edgeThreshold=self.patch_size, patchSize=self.patch_size)
+            self.local.orb = orb
+        return orb
+
+    def detect(self, image, max_features=0):
+        """
+        Returns:
+            tuple: (keypoint coordinates as a Nx2 float32 array relative to the image, descriptors or None)
+        """
+        if len(image.shape) == 3:
+            image = cv2.cvtColor(image[:, :, :3], cv2.COLOR_BGR2GRAY)
+        pad = self.patch_size
+        padded = cv2.copyMakeBorder(image, pad, pad, pad, pad, cv2.BORDER_REPLICATE)
+        orb = self.orb()
+        orb.setMaxFeatures(max_features or self.n_features)
+        keypoints, descriptors = orb.detectAndCompute(padded, None)
+        points = np.array([keypoint.pt for keypoint in keypoints], dtype=np.float32).reshape(-1, 2) - pad
+        return points, descriptors
+
+    def add_templates(self, feature_dict) -> None:
+        """
+        Precompute the descriptors of the templates, the features must be loaded at their original resolution.
+        """
+        for category_name, feature in feature_dict.items():
+            points, descriptors = self.detect(feature.mat)
+            if descriptors is not None and len(points) >= self.min_keypoints:
+                self.templates[category_name] = points, descriptors, feature.width, feature.height
+            else:
+                logger.debug(f'{category_name} has {len(points)} keypoints, uses template matching')
+        logger.info(f'KeypointMatcher precomputed {len(self.templates)} of {len(feature_dict)} templates')
+
+    def supports(self, category_name) -> bool:
+        return category_name in self.templates
+
+    def match(self, search_area, category_name, search_x=0, search_y=0):
+        """
+        Find the template in the search area.
+
+        Args:
+            search_area (np.ndarray): The BGR or grayscale search area.
+            category_name (str): The template to find.
+            search_x (int): x of the search area in the frame, added to the result.
+            search_y (int): y of the search area in the frame, added to the result.
+
+        Returns:
+            Box: The bounding box of the projected template with the inlier ratio as confidence, or None.
+        """
+        template_points, template_descriptors, width, height = self.templates[category_name]
+        area_height, area_width = search_area.shape[:2]
+        max_features = round(self.n_features * area_width * area_height / (width * height))
+        points, descriptors = self.detect(search_area,
+                                          min(self.max_search_features, max(self.n_features, max_features)))
+        if descriptors is None or len(points) < 2:
+            return None
+        good = [pair[0] for pair in self.matcher.knnMatch(template_descriptors, descriptors, k=2)
+                if len(pair) == 2 and pair[0].distance < self.ratio * pair[1].distance]
+        if len(good) < self.min_matches:
+            return None
+        source = template_points[[m.queryIdx for m in good]].reshape(-1, 1, 2)
+        destination = points[[m.trainIdx for m in good]].reshape(-1, 1, 2)
+        homography, inliers = cv2.findHomography(source, destination, cv2.RANSAC, 5.0)
+        if homography is None:
+            return None
+        inlier_count = np.count_nonzero(inliers)
+        confidence = float(inlier_count) / len(good)
+        if inlier_count < self.min_matches or confidence < self.min_inlier_ratio:
+            return None
+        corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]]).reshape(-1, 1, 2)
+        projected = cv2.perspectiveTransform(corners, homography).reshape(-1, 2)
+        x1, y1 = np.clip(projected.min(axis=0), 0, [area_width, area_height])
+        x2, y2 = np.clip(projected.max(axis=0), 0, [area_width, area_height])
+        if x2 - x1 < 1 or y2 - y1 < 1:
+            return None
+        return Box(search_x + x1, search_y + y1, to_x=search_x + x2, to_y=search_y + y2, confidence=confidence,
+                   name=category_name)
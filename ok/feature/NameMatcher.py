@@ -0,0 +1,116 @@
+import re
+import threading
+from functools import lru_cache
+
+# a combined alternation would renumber backreferences
+BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+class NameMatcher:
+    def __init__(self, names, max_cached_names=4096) -> None:
+        """
+        A precompiled list of exact names and regex patterns, in priority order, as accepted by find_box_by_name and
+        find_boxes_by_name. Exact names are a dict lookup, the patterns are joined in one alternation of named groups
+        so a name is searched once instead of once per pattern, and the priority of every name seen is cached.
+
+        Args:
+            names (str | Pattern | list): The names and patterns, the first has the highest priority.
+            max_cached_names (int): The priority cache is cleared when it grows over this size.
+        """
+        if isinstance(names, (str, re.Pattern)):
+            names = [names]
+        self.names = list(names)
+        self.max_cached_names = max_cached_names
+        # exact name to its lowest index
+        self.exact = {}
+        self.patterns = []
+        for i, name in enumerate(self.names):
+            if isinstance(name, str):
+                self.exact.setdefault(name, i)
+            elif isinstance(name, re.Pattern):
+                self.patterns.append((i, name))
+        self.combined = None
+        self.separate = []
+        combinable = [(i, pattern) for i, pattern in self.patterns if not BACKREFERENCE.search(pattern.pattern)]
+        if combinable and all(pattern.flags == combinable[0][1].flags for _, pattern in combinable):
+            try:
+                self.combined = re.compile('|'.join(f'(?P<_nm{i}>{pattern.pattern})' for i, pattern in combinable),
+                                           combinable[0][1].flags)
+                self.separate = [item for item in self.patterns if item not in combinable]
+            except re.error:
+                self.combined = None
+        if self.combined is None:
+            self.separate = self.patterns
+        self.combined_patterns = [item for item in self.patterns if item not in self.separate]
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def __str__(self):
+        return str(self.names)
+
+    def __repr__(self):
+        return f'NameMatcher({self.names})'
+
+    def priority(self, name):
+        """
+        Returns:
+            int: The index of the first name or pattern matching the name, None if none matches.
+        """
+        priority = self.cache.get(name, -1)
+        if priority != -1:
+            return priority
+        priority = self._priority(name)
+        with self.lock:
+            if len(self.cache) >= self.max_cached_names:
+                self.cache.clear()
+            self.cache[name] = priority
+        return priority
+
+    def matches(self, name) -> bool:
+        return self.priority(name) is not None
+
+    def _priority(self, name):
+        if not isinstance(name, str):
+            return None
+        best = self.exact.get(name)
+        if self.combined is not None:
+            match = self.combined.search(name)
+            if match is not None:
+                group = match.lastgroup
+                if group is not None and group.startswith('_nm'):
+                    index = int(group[3:])
+                else:
+                    index = next(int(key[3:]) for key, value in match.groupdict().items()
+                                 if key.startswith('_nm') and value is not None)
+                # the leftmost match wins in the alternation, a pattern listed before it may match further right
+                for i, pattern in self.combined_patterns:
+                    if i >= index:
+                        break
+                    if pattern.search(name):
+                        index = i
+                        break
+                if best is None or index < best:
+                    best = index
+        for i, pattern in self.separate:
+            if best is not None and i >= best:
+                break
+            if pattern.search(name):
+                best = i
+                break
+        return best
+
+
+def get_name_matcher(names) -> NameMatcher:
+    """
+    The cached NameMatcher of a name, pattern or list of them.
+    """
+    if isinstance(names, NameMatcher):
+        return names
+    if isinstance(names, (str, re.Pattern)):
+        names = [names]
+    return _cached_name_matcher(tuple(names))
+
+
+@lru_cache(maxsize=256)
+def _cached_name_matcher(names: tuple) -> NameMatcher:
+    return NameMatcher(names)
@@ -0,0 +1,65 @@
+import threading
+
+
+class RoiTracker:
+    def __init__(self, margin=0.01, min_margin=4) -> None:
+        """
+        Remembers where each feature was last found, so the next search can try a tight window around it first.
+
+        Args:
+            margin (float): Extra space around the last hit as a percentage of the frame width.
+            min_margin (int): Minimum extra space around the last hit in pixels.
+        """
+        self.margin = margin
+        self.min_margin = min_margin
+        self.last_boxes = {}
+        # category_name to [hits, misses]
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def window(self, category_name, frame_width, search_x1, search_y1, search_x2, search_y2):
+        """
+        The tight window around the last hit, clipped to the search area.
+
+        Returns:
+            tuple: (x1, y1, x2, y2) or None if the feature was not found last time.
+        """
+        last = self.last_boxes.get(category_name)
+        if last is None:
+            return None
+        margin = max(self.min_margin, round(frame_width * self.margin))
+        x1 = max(search_x1, last.x - margin)
+        y1 = max(search_y1, last.y - margin)
+        x2 = min(search_x2, last.x + last.width + margin)
+        y2 = min(search_y2, last.y + last.height + margin)
+        if x2 - x1 < last.width or y2 - y1 < last.height:
+            return None
+        return x1, y1, x2, y2
+
+    def update(self, category_name, boxes, hit=None):
+        """
+        Record the result of a search.
+
+        Args:
+            boxes (List[Box]): The boxes found, the highest confidence one is tracked.
+            hit (bool): True if found in the tight window, False if the tight window missed, None if not tried.
+        """
+        with self.lock:
+            if boxes:
+                self.last_boxes[category_name] = max(boxes, key=lambda box: box.confidence)
+            else:
+                self.last_boxes.pop(category_name, None)
+            if hit is not None:
+                counter = self.counters.setdefault(category_name, [0, 0])
+                counter[0 if hit else 1] += 1
+
+    def clear(self):
+        with self.lock:
+            self.last_boxes.clear()
+
+    def stats(self) -> dict:
+        hits = sum(counter[0] for counter in self.counters.values())
+        misses = sum(counter[1] for counter in self.counters.values())
+        return {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses) if hits + misses else 0,
+                'categories': {name: {'hits': counter[0], 'misses': counter[1]}
+                               for name, counter in self.counters.items()}}
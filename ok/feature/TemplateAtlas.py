@@ -0,0 +1,106 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+from ok.feature.Box import Box
+from ok.feature.Feature import Feature
+from ok.feature.FeatureSet import read_from_json, adjust_coordinates
+from ok.feature.TemplateCache import coco_source_hash
+from ok.logging.Logger import get_logger
+
+logger = get_logger(__name__)
+
+# bump when the layout of the atlas changes
+ATLAS_VERSION = 1
+
+
+def atlas_paths(coco_json):
+    """
+    Returns:
+        tuple: (packed template file, json index file) next to the coco json.
+    """
+    base = os.path.splitext(coco_json)[0]
+    return base + '.atlas', base + '.atlas.json'
+
+
+def build_atlas(coco_json) -> None:
+    """
+    Pack every template of the COCO dataset at its original resolution in a single raw file, plus a small json index
+    with the offset, shape and original bbox of each category, so it can be opened with np.memmap.
+    """
+    atlas_file, index_file = atlas_paths(coco_json)
+    feature_dict, box_dict, compressed, load_success = read_from_json(coco_json)
+    if not load_success:
+        logger.error(f'build_atlas can not read all images of {coco_json}')
+        return
+    with open(coco_json, 'r') as file:
+        data = json.load(file)
+    image_sizes = {}
+    coco_folder = os.path.dirname(coco_json)
+    category_map = {category['id']: category['name'] for category in data['categories']}
+    image_map = {image['id']: image for image in data['images']}
+    for annotation in data['annotations']:
+        image = image_map[annotation['image_id']]
+        if 'width' not in image or 'height' not in image:
+            height, width = cv2.imread(os.path.join(coco_folder, image['file_name'])).shape[:2]
+            image['width'], image['height'] = width, height
+        image_sizes[category_map[annotation['category_id']]] = [image['width'], image['height']]
+
+    templates = {}
+    offset = 0
+    temp_file = atlas_file + '.tmp'
+    with open(temp_file, 'wb') as file:
+        for name, box in box_dict.items():
+            entry = {'bbox': [box.x, box.y, box.width, box.height], 'image_size': image_sizes[name]}
+            feature = feature_dict.get(name)
+            if feature is not None:
+                mat = np.ascontiguousarray(feature.mat, dtype=np.uint8)
+                file.write(mat.tobytes())
+                entry['offset'] = offset
+                entry['shape'] = list(mat.shape)
+                offset += mat.nbytes
+            templates[name] = entry
+    os.replace(temp_file, atlas_file)
+    index = {'version': ATLAS_VERSION, 'source_hash': coco_source_hash(coco_json), 'ok_compressed': bool(compressed),
+             'size': offset, 'templates': templates}
+    with open(index_file, 'w') as file:
+        json.dump(index, file, indent=4)
+    logger.info(f'built template atlas {atlas_file} {len(templates)} templates {offset} bytes')
+
+
+def read_from_atlas(coco_json, width=-1, height=-1):
+    """
+    Load the templates from the atlas built by build_atlas, same return value as read_from_json.
+
+    The atlas is opened with np.memmap, so pages are only read when a template is used or resized, and several
+    processes on one host share the page cache. Templates that do not need scaling stay views of the memmap.
+
+    Returns:
+        tuple: (feature_dict, box_dict, ok_compressed, load_success) or None if the atlas is missing or out of date.
+    """
+    atlas_file, index_file = atlas_paths(coco_json)
+    if not os.path.exists(atlas_file) or not os.path.exists(index_file):
+        return None
+    with open(index_file, 'r') as file:
+        index = json.load(file)
+    if index.get('version') != ATLAS_VERSION or index.get('source_hash') != coco_source_hash(coco_json):
+        logger.info(f'template atlas {atlas_file} is out of date')
+        return None
+    atlas = np.memmap(atlas_file, dtype=np.uint8, mode='r') if index['size'] > 0 else None
+    feature_dict = {}
+    box_dict = {}
+    for name, entry in index['templates'].items():
+        x, y, w, h = entry['bbox']
+        image_width, image_height = entry['image_size']
+        x, y, w, h, scale = adjust_coordinates(x, y, w, h, width, height, image_width, image_height,
+                                               hcenter='hcenter' in name)
+        if 'offset' in entry:
+            shape = entry['shape']
+            mat = atlas[entry['offset']:entry['offset'] + int(np.prod(shape))].reshape(shape)
+            if mat.shape[1] != w or mat.shape[0] != h:
+                mat = cv2.resize(mat, (w, h))
+            feature_dict[name] = Feature(mat, x, y, scale)
+        box_dict[name] = Box(x, y, w, h, name=name)
+    return feature_dict, box_dict, index['ok_compressed'], True
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+from ok.feature.Box import Box
+from ok.feature.Feature import Feature
+from ok.logging.Logger import get_logger
+from ok.util.path import ensure_dir
+
+logger = get_logger(__name__)
+
+# bump when the layout of the cache file changes
+CACHE_VERSION = 1
+
+
+class TemplateCache:
+    def __init__(self, coco_json: str, cache_folder: str) -> None:
+        """
+        On-disk cache of the templates scaled to one resolution, stored as uncompressed .npz files.
+
+        Args:
+            coco_json (str): The COCO json the templates are loaded from.
+            cache_folder (str): The folder the cache files are written to.
+        """
+        self.coco_json = coco_json
+        self.cache_folder = cache_folder
+        self.prefix = os.path.splitext(os.path.basename(coco_json))[0]
+
+    def source_hash(self) -> str:
+        return coco_source_hash(self.coco_json)
+
+    def cache_file(self, source_hash, width, height) -> str:
+        return os.path.join(self.cache_folder, f'{self.prefix}_{source_hash[:16]}_{width}x{height}.npz')
+
+    def load(self, width, height):
+        """
+        Returns:
+            tuple: (feature_dict, box_dict, ok_compressed) or None if there is no valid cache for the resolution.
+        """
+        try:
+            cache_file = self.cache_file(self.source_hash(), width, height)
+            if not os.path.exists(cache_file):
+                return None
+            feature_dict = {}
+            box_dict = {}
+            with np.load(cache_file, allow_pickle=False) as data:
+                if int(data['version']) != CACHE_VERSION:
+                    return None
+                for i, (name, (x, y, w, h), scale, has_feature) in enumerate(
+                        zip(data['names'], data['boxes'], data['scales'], data['has_feature'])):
+                    name = str(name)
+                    if has_feature:
+                        feature_dict[name] = Feature(data[f'mat_{i}'], int(x), int(y), float(scale))
+                    box_dict[name] = Box(int(x), int(y), int(w), int(h), name=name)
+                compressed = bool(data['compressed'])
+            logger.debug(f'loaded {len(box_dict)} templates from cache {cache_file}')
+            return feature_dict, box_dict, compressed
+        except Exception as e:
+            logger.error(f'load template cache error', e)
+            return None
+
+    def save(self, width, height, feature_dict, box_dict, compressed) -> None:
+        try:
+            source_hash = self.source_hash()
+            ensure_dir(self.cache_folder)
+            self.remove_stale(source_hash)
+            names = list(box_dict.keys())
+            arrays = {
+                'version': np.array(CACHE_VERSION),
+                'compressed': np.array(bool(compressed)),
+                'names': np.array(names, dtype=str),
+                'boxes': np.array([[box_dict[name].x, box_dict[name].y, box_dict[name].width, box_dict[name].height]
+                                   for name in names], dtype=np.int32).reshape(-1, 4),
+                'scales': np.array([feature_dict[name].scaling if name in feature_dict else 1 for name in names],
+                                   dtype=np.float64),
+                'has_feature': np.array([name in feature_dict for name in names], dtype=bool),
+            }
+            for i, name in enumerate(names):
+                if name in feature_dict:
+                    arrays[f'mat_{i}'] = feature_dict[name].mat
+            cache_file = self.cache_file(source_hash, width, height)
+            temp_file = cache_file + '.tmp.npz'
+            np.savez(temp_file, **arrays)
+            os.replace(temp_file, cache_file)
+            logger.debug(f'saved {len(names)} templates to cache {cache_file}')
+        except Exception as e:
+            logger.error(f'save template cache error', e)
+
+    def remove_stale(self, source_hash) -> None:
+        pattern = re.compile(re.escape(self.prefix) + r'_([0-9a-f]{16})_\d+x\d+\.npz')
+        for file in os.listdir(self.cache_folder):
+            match = pattern.fullmatch(file)
+            if match and match.group(1) != source_hash[:16]:
+                os.remove(os.path.join(self.cache_folder, file))
+
+
+def coco_source_hash(coco_json) -> str:
+    """
+    Hash of the coco json content plus the size and modified time of every image it references,
+    so that a changed json or a re-exported image invalidates anything derived from them.
+    """
+    md5_hash = hashlib.md5()
+    with open(coco_json, 'rb') as file:
+        content = file.read()
+    md5_hash.update(content)
+    coco_folder = os.path.dirname(coco_json)
+    for image in json.loads(content).get('images', []):
+        image_path = os.path.join(coco_folder, image['file_name'])
+        if os.path.exists(image_path):
+            stat = os.stat(image_path)
+            md5_hash.update(f"{image['file_name']}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return md5_hash.hexdigest()
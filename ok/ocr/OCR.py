@@ -1,24 +1,91 @@
+import math
+import threading
 import time
+from concurrent.futures import Future, wait
 from typing import List, Pattern
 
 import cv2
+import numpy as np
 
 from ok.feature.Box import Box, sort_boxes, find_boxes_by_name, relative_box
+from ok.feature.NameMatcher import NameMatcher
 from ok.gui.Communicate import communicate
 from ok.logging.Logger import get_logger
+from ok.ocr.OcrBackend import OcrBackend, as_backend
+from ok.util.LruCache import content_hash
 
 logger = get_logger(__name__)
 
+# thread name prefix of the single worker of TaskExecutor.ocr_pool that runs every ocr inference
+OCR_WORKER_PREFIX = "OcrWorker"
+
 
 class OCR:
     executor = None
     ocr_default_threshold = 0.8
     ocr_target_height = 0
 
-    def ocr(self, x=0, y=0, to_x=1, to_y=1, match: str | List[str] | Pattern[str] | List[Pattern[str]] | None = None,
+    def ocr(self, x=0, y=0, to_x=1, to_y=1,
+            match: str | List[str] | Pattern[str] | List[Pattern[str]] | NameMatcher | None = None,
             width=0, height=0, box: Box = None, name=None,
             threshold=0,
-            frame=None, target_height=0, use_grayscale=False, log=False):
+            frame=None, target_height=0, use_grayscale=False, log=False, single_line=False):
+        """
+        OCR an area of the frame.
+
+        Args:
+            single_line (bool): The area holds exactly one line of text, skip the detection and run only the
+                recognition on it, returns at most one box covering the whole area.
+        """
+        request = self.prepare_ocr(x, y, to_x, to_y, match, width, height, box, name, threshold, frame, target_height,
+                                   use_grayscale, log, single_line)
+        if request.cached is not None:
+            return self.infer_ocr(request)
+        return self.run_on_ocr_worker(self.infer_ocr, request)
+
+    def ocr_async(self, x=0, y=0, to_x=1, to_y=1,
+                  match: str | List[str] | Pattern[str] | List[Pattern[str]] | NameMatcher | None = None,
+                  width=0, height=0, box: Box = None, name=None,
+                  threshold=0,
+                  frame=None, target_height=0, use_grayscale=False, log=False, single_line=False) -> Future:
+        """
+        Same as ocr, but the inference runs on the ocr worker of the executor so the task thread is free meanwhile.
+        The area is cropped right away, later frames do not change the result.
+
+        Returns:
+            Future: The future of the list of boxes ocr would return.
+        """
+        request = self.prepare_ocr(x, y, to_x, to_y, match, width, height, box, name, threshold, frame, target_height,
+                                   use_grayscale, log, single_line, copy=True)
+        ocr_pool = getattr(self.executor, 'ocr_pool', None)
+        if ocr_pool is not None and request.cached is None:
+            return ocr_pool.submit(self.infer_ocr, request)
+        future = Future()
+        try:
+            future.set_result(self.infer_ocr(request))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def run_on_ocr_worker(self, fn, *args):
+        """
+        Run fn on the ocr worker of the executor and wait for its result, so the ocr engine, which is not thread safe,
+        is only ever used by one thread, also when ocr is called while an ocr_async is in flight.
+        """
+        ocr_pool = getattr(self.executor, 'ocr_pool', None)
+        if ocr_pool is None or threading.current_thread().name.startswith(OCR_WORKER_PREFIX):
+            return fn(*args)
+        return ocr_pool.submit(fn, *args).result()
+
+    def prepare_ocr(self, x=0, y=0, to_x=1, to_y=1, match=None, width=0, height=0, box: Box = None, name=None,
+                    threshold=0, frame=None, target_height=0, use_grayscale=False, log=False, single_line=False,
+                    copy=False):
+        """
+        The part of ocr that runs on the task thread, waits if paused, crops the area and looks up the cache.
+
+        Returns:
+            OcrRequest: The request to give to infer_ocr.
+        """
         if hasattr(self, 'paused') and self.paused:
             self.sleep(1)
         if threshold == 0:
@@ -32,64 +99,258 @@ class OCR:
             image = self.frame
         if image is None:
             raise Exception("ocr no frame")
-        else:
-            if box is None:
-                frame_height, frame_width, *_ = image.shape[1], image.shape[0]
-                box = relative_box(frame_height, frame_width, x, y, to_x, to_y, width, height, name)
-            original_height = image.shape[0]
-            if box is not None:
-                x, y, w, h = box.x, box.y, box.width, box.height
+        if box is None:
+            frame_height, frame_width, *_ = image.shape[1], image.shape[0]
+            box = relative_box(frame_height, frame_width, x, y, to_x, to_y, width, height, name)
+        original_height = image.shape[0]
+        frame_cache = getattr(self.executor, 'frame_cache', None)
+        if box is not None:
+            x, y, w, h = box.x, box.y, box.width, box.height
+            if use_grayscale and frame is None and frame_cache is not None:
+                image = frame_cache.gray_area(image, x, y, x + w, y + h)
+            else:
                 image = image[y:y + h, x:x + w]
-                if not box.name and match:
-                    box.name = str(match)
-            if use_grayscale:
-                image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-
-            image, scale_factor = resize_image(image, original_height, target_height)
-
-            result, _ = self.executor.ocr(image, use_det=True, use_cls=False, use_rec=True)
-
-            detected_boxes = []
-            ocr_boxes = None
-            # Process the results and create Box objects
-            if result is not None:
-                for res in result:
-                    pos = res[0]
-                    text = res[1]
-                    confidence = res[2]
-                    width, height = round(pos[2][0] - pos[0][0]), round(pos[2][1] - pos[0][1])
-                    if width <= 0 or height <= 0:
-                        logger.error(f'ocr result negative box {text} {confidence} {width}x{height} pos:{pos}')
-                        continue
-                    if confidence >= threshold:
-                        detected_box = Box(pos[0][0], pos[0][1], width,
-                                           height,
-                                           confidence, text)
-                        scale_box(detected_box, scale_factor)
-                        if box is not None:
-                            detected_box.x += box.x
-                            detected_box.y += box.y
-                        detected_boxes.append(detected_box)
-                        ocr_boxes = detected_boxes
-                if match is not None:
-                    detected_boxes = find_boxes_by_name(detected_boxes, match)
-
-            communicate.emit_draw_box("ocr" + name if name else "", detected_boxes, "red")
-            communicate.emit_draw_box("ocr_zone" + name if name else "", box, "blue")
-            if log:
-                logger.info(
-                    f"ocr_zone {box} found result: {detected_boxes}) time: {(time.time() - start):.2f} scale_factor: {scale_factor:.2f}")
-            if log and not detected_boxes and ocr_boxes:
-                logger.info(f'ocr detected but no match: {match} {ocr_boxes}')
-            return sort_boxes(detected_boxes)
+            if not box.name and match:
+                box.name = str(match)
+        if use_grayscale and len(image.shape) != 2:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        elif copy:
+            # the worker must not see the frame buffer change
+            image = image.copy()
+
+        # the same pixels always give the same text, polling a static area hits the cache
+        ocr_cache = getattr(self.executor, 'ocr_cache', None)
+        cache_key = None
+        cached = None
+        if ocr_cache is not None and ocr_cache.enabled:
+            cache_key = (content_hash(image), original_height, target_height, use_grayscale, threshold, single_line)
+            cached = ocr_cache.get(cache_key)
+        return OcrRequest(image, box, name, match, threshold, original_height, target_height, single_line, log,
+                          start, cache_key, cached)
+
+    def infer_ocr(self, request) -> List[Box]:
+        """
+        The part of ocr that runs the engine, safe to run on a worker thread, it never sleeps or reads the frame.
+        """
+        box = request.box
+        name = request.name
+        match = request.match
+        if request.cached is not None:
+            relative_boxes, scale_factor = request.cached
+        else:
+            if request.single_line:
+                relative_boxes, scale_factor = self.recognize_line(request.image, request.original_height,
+                                                                   request.target_height, request.threshold)
+            else:
+                relative_boxes, scale_factor = self.detect_boxes(request.image, request.original_height,
+                                                                 request.target_height, request.threshold)
+            ocr_cache = getattr(self.executor, 'ocr_cache', None)
+            if request.cache_key is not None and ocr_cache is not None:
+                ocr_cache.put(request.cache_key, (relative_boxes, scale_factor))
+
+        # translate the boxes relative to the ocr area to the current offsets
+        if box is not None:
+            detected_boxes = [relative.copy(x_offset=box.x, y_offset=box.y) for relative in relative_boxes]
+        else:
+            detected_boxes = [relative.copy() for relative in relative_boxes]
+        ocr_boxes = detected_boxes or None
+        if match is not None:
+            detected_boxes = find_boxes_by_name(detected_boxes, match)
+
+        communicate.emit_draw_box("ocr" + name if name else "", detected_boxes, "red")
+        communicate.emit_draw_box("ocr_zone" + name if name else "", box, "blue")
+        if request.log:
+            logger.info(
+                f"ocr_zone {box} found result: {detected_boxes}) time: {(time.time() - request.start):.2f} scale_factor: {scale_factor:.2f}")
+        if request.log and not detected_boxes and ocr_boxes:
+            logger.info(f'ocr detected but no match: {match} {ocr_boxes}')
+        return sort_boxes(detected_boxes)
+
+    def ocr_backend(self) -> OcrBackend:
+        """
+        The ocr engine of the executor as an OcrBackend, a raw RapidOCR instance is wrapped.
+        """
+        return as_backend(self.executor.ocr)
+
+    def detect_boxes(self, image, original_height, target_height, threshold):
+        """
+        Run the ocr engine on the cropped image.
+
+        Returns:
+            tuple: (boxes above the threshold relative to the image, the resize scale factor)
+        """
+        image, scale_factor = resize_image(image, original_height, target_height)
+
+        detected_boxes = [detected_box for detected_box in self.ocr_backend().detect(image) if
+                          detected_box.confidence >= threshold]
+        for detected_box in detected_boxes:
+            scale_box(detected_box, scale_factor)
+        return detected_boxes, scale_factor
+
+    def recognize_line(self, image, original_height, target_height, threshold):
+        """
+        Run only the recognition of the ocr engine on the cropped image of a single line of text.
+
+        Returns:
+            tuple: (a box covering the image with the text if above the threshold, the resize scale factor)
+        """
+        resized, scale_factor = resize_image(image, original_height, target_height)
+
+        text, confidence = self.ocr_backend().recognize(resized)
+
+        if text and confidence >= threshold:
+            return [Box(0, 0, image.shape[1], image.shape[0], confidence, text)], scale_factor
+        return [], scale_factor
+
+    def recognize_lines(self, images, original_height, target_height, threshold):
+        """
+        Run only the recognition of the ocr engine on several cropped images of a single line of text, in one batch.
+
+        Returns:
+            list: (a box covering the image with the text if above the threshold, the resize scale factor) of each
+                image.
+        """
+        resized = [resize_image(image, original_height, target_height) for image in images]
+        recognized = self.ocr_backend().recognize_batch([resized_image for resized_image, _ in resized])
+        results = []
+        for image, (_, scale_factor), (text, confidence) in zip(images, resized, recognized):
+            if text and confidence >= threshold:
+                results.append(([Box(0, 0, image.shape[1], image.shape[0], confidence, text)], scale_factor))
+            else:
+                results.append(([], scale_factor))
+        return results
+
+    def detect_boxes_batch(self, images, original_height, target_height, threshold):
+        """
+        Run the ocr engine once on all the cropped images, stacked vertically on one canvas with a gap between them
+        wide enough that the detection never joins text of two images, the results are mapped back to each image by
+        the center of the detected box.
+
+        Returns:
+            list: (boxes above the threshold relative to the image, the resize scale factor) of each image.
+        """
+        resized = [resize_image(image, original_height, target_height) for image in images]
+        scale_factor = resized[0][1]
+        backend = self.ocr_backend()
+        if backend.native_batch:
+            results = []
+            for detected_boxes in backend.batch([image for image, _ in resized]):
+                detected_boxes = [detected_box for detected_box in detected_boxes if
+                                  detected_box.confidence >= threshold]
+                for detected_box in detected_boxes:
+                    scale_box(detected_box, scale_factor)
+                results.append((detected_boxes, scale_factor))
+            return results
+        heights = [image.shape[0] for image, _ in resized]
+        gap = max(16, max(heights) // 2)
+        starts = np.cumsum([0] + [height + gap for height in heights[:-1]])
+        canvas_shape = (starts[-1] + heights[-1], max(image.shape[1] for image, _ in resized)) + resized[0][0].shape[2:]
+        # fill with the average color so the gaps do not add edges the detection could pick up
+        background = np.mean([image.reshape(-1, *image.shape[2:]).mean(axis=0) for image, _ in resized], axis=0)
+        canvas = np.empty(canvas_shape, dtype=resized[0][0].dtype)
+        canvas[:] = np.round(background).astype(canvas.dtype)
+        for (image, _), start in zip(resized, starts):
+            canvas[start:start + image.shape[0], :image.shape[1]] = image
+
+        results = [([], scale_factor) for _ in images]
+        for detected_box in backend.detect(canvas):
+            if detected_box.confidence < threshold:
+                continue
+            center_y = detected_box.y + detected_box.height / 2
+            i = int(np.searchsorted(starts, center_y, side='right')) - 1
+            if i < 0 or center_y >= starts[i] + heights[i]:
+                continue
+            detected_box.y -= int(starts[i])
+            scale_box(detected_box, scale_factor)
+            results[i][0].append(detected_box)
+        return results
+
+    def ocr_many(self, boxes: List[Box],
+                 match: str | List[str] | Pattern[str] | List[Pattern[str]] | NameMatcher | None = None, threshold=0,
+                 frame=None, target_height=0, use_grayscale=False, log=False,
+                 single_line=False) -> List[List[Box]]:
+        """
+        OCR several areas of the same frame with a single inference pass instead of one per area.
+
+        Args:
+            boxes (List[Box]): The areas to OCR.
+            match: Same as ocr, applied to the result of every area.
+            single_line (bool): Every area holds one line of text, only the recognition runs, on all of them at once.
+
+        Returns:
+            List[List[Box]]: The boxes found in each area in frame coordinates, in the order of boxes.
+        """
+        if hasattr(self, 'paused') and self.paused:
+            self.sleep(1)
+        if threshold == 0:
+            threshold = self.ocr_default_threshold
+        if target_height == 0:
+            target_height = self.ocr_target_height
+        start = time.time()
+        image = frame if frame is not None else self.frame
+        if image is None:
+            raise Exception("ocr no frame")
+        original_height = image.shape[0]
+        frame_cache = getattr(self.executor, 'frame_cache', None) if use_grayscale and frame is None else None
+        ocr_cache = getattr(self.executor, 'ocr_cache', None)
+
+        relative_results = [None] * len(boxes)
+        pending = []
+        for i, box in enumerate(boxes):
+            if frame_cache is not None:
+                crop = frame_cache.gray_area(image, box.x, box.y, box.x + box.width, box.y + box.height)
+            else:
+                crop = image[box.y:box.y + box.height, box.x:box.x + box.width]
+            if use_grayscale and len(crop.shape) != 2:
+                crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+            cache_key = None
+            if ocr_cache is not None and ocr_cache.enabled:
+                cache_key = (content_hash(crop), original_height, target_height, use_grayscale, threshold,
+                             single_line)
+                cached = ocr_cache.get(cache_key)
+                if cached is not None:
+                    relative_results[i] = cached[0]
+                    continue
+            pending.append((i, crop, cache_key))
+
+        crops = [crop for _, crop, _ in pending]
+        if not crops:
+            detected = []
+        elif single_line:
+            detected = self.run_on_ocr_worker(self.recognize_lines, crops, original_height, target_height, threshold)
+        elif len(crops) == 1:
+            detected = [self.run_on_ocr_worker(self.detect_boxes, crops[0], original_height, target_height, threshold)]
+        else:
+            detected = self.run_on_ocr_worker(self.detect_boxes_batch, crops, original_height, target_height,
+                                              threshold)
+        for (i, _, cache_key), result in zip(pending, detected):
+            relative_results[i] = result[0]
+            if cache_key is not None:
+                ocr_cache.put(cache_key, result)
+
+        results = []
+        for box, relative_boxes in zip(boxes, relative_results):
+            detected_boxes = [relative.copy(x_offset=box.x, y_offset=box.y) for relative in relative_boxes]
+            if match is not None:
+                detected_boxes = find_boxes_by_name(detected_boxes, match)
+            results.append(sort_boxes(detected_boxes))
+
+        communicate.emit_draw_box("ocr_many", [detected for detected_boxes in results for detected in detected_boxes],
+                                  "red")
+        communicate.emit_draw_box("ocr_many_zone", list(boxes), "blue")
+        if log:
+            logger.info(f'ocr_many {len(boxes)} zones {len(pending)} not cached found result: {results} '
+                        f'time: {(time.time() - start):.2f}')
+        return results
 
     def wait_click_ocr(self, x=0, y=0, to_x=1, to_y=1, width=0, height=0, box=None, name=None,
-                       match: str | List[str] | Pattern[str] | List[Pattern[str]] | None = None, threshold=0,
-                       frame=None, target_height=0, time_out=0, raise_if_not_found=False):
+                       match: str | List[str] | Pattern[str] | List[Pattern[str]] | NameMatcher | None = None,
+                       threshold=0, frame=None, target_height=0, time_out=0, raise_if_not_found=False,
+                       single_line=False):
         box = self.wait_ocr(x, y, width=width, height=height, to_x=to_x, to_y=to_y, box=box, name=name, match=match,
                             threshold=threshold,
                             frame=frame, target_height=target_height, time_out=time_out,
-                            raise_if_not_found=raise_if_not_found)
+                            raise_if_not_found=raise_if_not_found, single_line=single_line)
         if box is not None:
             self.click_box(box)
             return box
@@ -97,14 +358,160 @@ class OCR:
             logger.warning(f'wait ocr no box {x} {y} {width} {height} {to_x} {to_y} {match}')
 
     def wait_ocr(self, x=0, y=0, to_x=1, to_y=1, width=0, height=0, name=None, box=None,
-                 match: str | List[str] | Pattern[str] | List[Pattern[str]] | None = None, threshold=0,
-                 frame=None, target_height=0, time_out=0, raise_if_not_found=False):
-        return self.wait_until(lambda:
-                               self.ocr(x, y, to_x=to_x, to_y=to_y, width=width, height=height, box=box, name=name,
-                                        match=match,
-                                        threshold=threshold,
-                                        frame=frame, target_height=target_height), time_out=time_out,
-                               raise_if_not_found=raise_if_not_found)
+                 match: str | List[str] | Pattern[str] | List[Pattern[str]] | NameMatcher | None = None, threshold=0,
+                 frame=None, target_height=0, time_out=0, raise_if_not_found=False, single_line=False,
+                 change_threshold=-1):
+        """
+        Poll ocr until it finds a match.
+
+        Args:
+            change_threshold (float): Skip the ocr of a poll while the area did not change since the last poll that
+                found nothing, see RegionGate, 0 to ocr every poll, -1 for the executor default.
+        """
+        gate = RegionGate(self.ocr_change_threshold(change_threshold))
+
+        def poll():
+            image = frame if frame is not None else self.frame
+            if gate.should_skip(self.ocr_area(image, x, y, to_x, to_y, width, height, box, name)):
+                self.count_ocr(skipped=True)
+                return None
+            self.count_ocr(skipped=False)
+            result = self.ocr(x, y, to_x=to_x, to_y=to_y, width=width, height=height, box=box, name=name,
+                              match=match,
+                              threshold=threshold,
+                              frame=frame, target_height=target_height, single_line=single_line)
+            gate.record(result)
+            return result
+
+        return self.wait_until(poll, time_out=time_out, raise_if_not_found=raise_if_not_found)
+
+    def ocr_change_threshold(self, change_threshold=-1):
+        if change_threshold < 0:
+            change_threshold = getattr(self.executor, 'ocr_change_threshold', 0)
+        return change_threshold
+
+    def count_ocr(self, skipped):
+        count_ocr = getattr(self.executor, 'count_ocr', None)
+        if count_ocr is not None:
+            count_ocr(skipped)
+
+    @staticmethod
+    def ocr_area(image, x=0, y=0, to_x=1, to_y=1, width=0, height=0, box=None, name=None):
+        # the cropped area ocr would run on
+        if box is None:
+            box = relative_box(image.shape[1], image.shape[0], x, y, to_x, to_y, width, height, name)
+        return box.crop_frame(image)
+
+    def wait_ocr_async(self, x=0, y=0, to_x=1, to_y=1, width=0, height=0, name=None, box=None,
+                       match: str | List[str] | Pattern[str] | List[Pattern[str]] | NameMatcher | None = None,
+                       threshold=0, target_height=0, time_out=0, raise_if_not_found=False, use_grayscale=False,
+                       single_line=False, change_threshold=-1):
+        """
+        Same as wait_ocr, but new frames keep being captured while the ocr worker recognizes the previous one, and
+        the next inference starts right away on the latest frame, so the polling rate is the ocr throughput.
+        """
+        from ok.task.TaskExecutor import WaitFailedException
+        if time_out == 0:
+            time_out = self.executor.wait_scene_timeout
+        start = time.time()
+        gate = RegionGate(self.ocr_change_threshold(change_threshold))
+
+        def submit(current_frame):
+            return self.ocr_async(x, y, to_x=to_x, to_y=to_y, width=width, height=height, box=box, name=name,
+                                  match=match, threshold=threshold, frame=current_frame, target_height=target_height,
+                                  use_grayscale=use_grayscale, single_line=single_line)
+
+        frame = self.next_frame()
+        while True:
+            captured = False
+            if gate.should_skip(self.ocr_area(frame, x, y, to_x, to_y, width, height, box, name)):
+                self.count_ocr(skipped=True)
+                result = None
+            else:
+                self.count_ocr(skipped=False)
+                future = submit(frame)
+                while not future.done():
+                    # the loop never sleeps while the worker is busy, notice a disabled or paused task anyway
+                    self.executor.check_task()
+                    frame = self.next_frame()
+                    captured = True
+                    wait([future], timeout=self.executor.wait_until_check_delay or 0.01)
+                result = future.result()
+                gate.record(result)
+            if result:
+                return result
+            if time.time() - start > time_out:
+                logger.info(f"wait_ocr_async timeout {match} {time_out} seconds")
+                break
+            self.executor.check_task()
+            self.sleep(self.executor.wait_until_check_delay)
+            if not captured or self.executor.wait_until_check_delay > 0:
+                # a cache hit or a skip completes at once, still wait for a new frame
+                frame = self.next_frame()
+        if raise_if_not_found:
+            raise WaitFailedException()
+        return None
+
+
+class RegionGate:
+    def __init__(self, threshold, cell_pixels=16) -> None:
+        """
+        Tells a polling loop to skip the ocr of an area that did not change since the last ocr that found nothing.
+        The area is compared by a signature, its grayscale downsampled with area averaging so each signature pixel
+        averages at most cell_pixels source pixels, which evens out capture noise while a changed character still
+        moves the pixels it covers a lot, however large the area is.
+
+        Args:
+            threshold (float): The area changed if any pixel of the signature changed by more than this, 0 disables.
+            cell_pixels (int): The most source pixels one signature pixel averages.
+        """
+        self.threshold = threshold
+        self.cell_pixels = cell_pixels
+        self.signature = None
+        self.miss_signature = None
+
+    def should_skip(self, image) -> bool:
+        if self.threshold <= 0 or image is None or image.size == 0:
+            return False
+        self.signature = region_signature(image, self.cell_pixels)
+        return (self.miss_signature is not None and self.miss_signature.shape == self.signature.shape and
+                int(np.abs(self.signature - self.miss_signature).max()) <= self.threshold)
+
+    def record(self, found) -> None:
+        self.miss_signature = None if found else self.signature
+
+
+def region_signature(image, cell_pixels=16) -> np.ndarray:
+    if len(image.shape) == 3:
+        image = cv2.cvtColor(image[:, :, :3], cv2.COLOR_BGR2GRAY)
+    height, width = image.shape
+    step = max(1.0, math.sqrt(cell_pixels))
+    if step == 1.0:
+        return image.astype(np.int16)
+    signature = cv2.resize(image, (max(1, math.ceil(width / step)), max(1, math.ceil(height / step))),
+                           interpolation=cv2.INTER_AREA)
+    return signature.astype(np.int16)
+
+
+class OcrRequest:
+    __slots__ = ('image', 'box', 'name', 'match', 'threshold', 'original_height', 'target_height', 'single_line',
+                 'log', 'start', 'cache_key', 'cached')
+
+    def __init__(self, image, box, name, match, threshold, original_height, target_height, single_line, log, start,
+                 cache_key, cached) -> None:
+        # the cropped area and the options of one ocr call, passed from prepare_ocr to infer_ocr
+        self.image = image
+        self.box = box
+        self.name = name
+        self.match = match
+        self.threshold = threshold
+        self.original_height = original_height
+        self.target_height = target_height
+        self.single_line = single_line
+        self.log = log
+        self.start = start
+        self.cache_key = cache_key
+        self.cached = cached
 
 
 def resize_image(image, original_height, target_height):
@@ -0,0 +1,210 @@
+import os
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+from ok.feature.Box import Box, sort_boxes
+from ok.logging.Logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class OcrBackend(ABC):
+    """
+    An OCR engine as used by the OCR mixin. Every method returns the normalized result: Box objects in the
+    coordinates of the given image, with the text as name and the recognition score as confidence.
+    """
+    name = "None"
+    # True if batch runs the images through the engine together, else ocr_many packs them on one canvas
+    native_batch = False
+
+    @abstractmethod
+    def detect(self, image) -> List[Box]:
+        """
+        Find and recognize every text line of the image.
+        """
+        pass
+
+    @abstractmethod
+    def recognize(self, image) -> Tuple[str, float]:
+        """
+        Recognize the image as a single line of text, without detection.
+
+        Returns:
+            tuple: (text, confidence), ('', 0) if nothing is recognized.
+        """
+        pass
+
+    def batch(self, images) -> List[List[Box]]:
+        """
+        detect on several images.
+        """
+        return [self.detect(image) for image in images]
+
+    def recognize_batch(self, images) -> List[Tuple[str, float]]:
+        """
+        recognize on several single line images, engines that can should run them through the recognizer together.
+        """
+        return [self.recognize(image) for image in images]
+
+    def __str__(self):
+        return self.name
+
+
+class RapidOcrBackend(OcrBackend):
+    name = "RapidOCR"
+
+    def __init__(self, engine) -> None:
+        """
+        Wraps a RapidOCR instance, openvino or onnxruntime.
+
+        Args:
+            engine: The RapidOCR instance.
+        """
+        self.engine = engine
+
+    def __call__(self, *args, **kwargs):
+        # keeps code calling the raw RapidOCR signature working
+        return self.engine(*args, **kwargs)
+
+    def detect(self, image) -> List[Box]:
+        result, _ = self.engine(image, use_det=True, use_cls=False, use_rec=True)
+        boxes = []
+        if result is not None:
+            for pos, text, confidence in result:
+                width, height = round(pos[2][0] - pos[0][0]), round(pos[2][1] - pos[0][1])
+                if width <= 0 or height <= 0:
+                    logger.error(f'ocr result negative box {text} {confidence} {width}x{height} pos:{pos}')
+                    continue
+                boxes.append(Box(pos[0][0], pos[0][1], width, height, confidence, text))
+        return boxes
+
+    def recognize(self, image) -> Tuple[str, float]:
+        result, _ = self.engine(image, use_det=False, use_cls=False, use_rec=True)
+        if result:
+            return result[0][0], float(result[0][1])
+        return '', 0
+
+    def recognize_batch(self, images) -> List[Tuple[str, float]]:
+        text_rec = getattr(self.engine, 'text_rec', None)
+        if text_rec is None or len(images) < 2:
+            return super().recognize_batch(images)
+        # the recognizer takes a list of BGR crops and batches them by width
+        images = [cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if len(image.shape) == 2 else image for image in images]
+        result, _ = text_rec(images)
+        return [(text, float(confidence)) if text else ('', 0) for text, confidence in result]
+
+
+class TemplateGlyphBackend(OcrBackend):
+    name = "TemplateGlyph"
+
+    def __init__(self, glyphs: dict, threshold=0.9, space_ratio=0.5) -> None:
+        """
+        A deterministic stand-in OCR that template matches one image per character, for tests and benchmarks that
+        must not depend on a neural network. The glyphs must be at the scale they appear in the images.
+
+        Args:
+            glyphs (dict): Character or string to its BGR or grayscale image.
+            threshold (float): Min TM_CCOEFF_NORMED score of a glyph hit, also its confidence.
+            space_ratio (float): Glyphs further apart than this times the glyph height start a new box.
+        """
+        self.glyphs = {}
+        for text, glyph in glyphs.items():
+            if len(glyph.shape) == 3:
+                glyph = cv2.cvtColor(glyph, cv2.COLOR_BGR2GRAY)
+            self.glyphs[text] = glyph
+        self.threshold = threshold
+        self.space_ratio = space_ratio
+
+    @classmethod
+    def from_folder(cls, folder, **kwargs) -> 'TemplateGlyphBackend':
+        """
+        Load every image of the folder as a glyph, the file name without extension is its text.
+        """
+        if not folder or not os.path.isdir(folder):
+            raise ValueError(f'TemplateGlyphBackend: glyph folder {folder} not found')
+        glyphs = {}
+        for file in sorted(os.listdir(folder)):
+            text, ext = os.path.splitext(file)
+            if ext.lower() in ('.png', '.jpg', '.bmp'):
+                glyph = cv2.imdecode(np.fromfile(os.path.join(folder, file), dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+                if glyph is not None:
+                    glyphs[text] = glyph
+        return cls(glyphs, **kwargs)
+
+    def find_glyphs(self, gray):
+        # every glyph hit as (x, y, width, height, score, text), overlapping hits keep the best score
+        hits = []
+        for text, glyph in self.glyphs.items():
+            height, width = glyph.shape
+            if height > gray.shape[0] or width > gray.shape[1]:
+                continue
+            result = cv2.matchTemplate(gray, glyph, cv2.TM_CCOEFF_NORMED)
+            result = np.nan_to_num(result, nan=0, posinf=1, neginf=0)
+            # local maxima above the threshold
+            peaks = (result >= self.threshold) & (result == cv2.dilate(result, np.ones((3, 3), np.uint8)))
+            for y, x in zip(*np.nonzero(peaks)):
+                hits.append((int(x), int(y), width, height, float(result[y, x]), text))
+        hits.sort(key=lambda hit: (-hit[4], hit[1], hit[0], hit[5]))
+        kept = []
+        for hit in hits:
+            x, y, width, height = hit[:4]
+            if all(x >= k[0] + k[2] or k[0] >= x + width or y >= k[1] + k[3] or k[1] >= y + height for k in kept):
+                kept.append(hit)
+        return sorted(kept, key=lambda hit: (hit[0], hit[1]))
+
+    def detect(self, image) -> List[Box]:
+        gray = image if len(image.shape) == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        boxes = []
+        # join the glyphs left to right into words, a glyph joins the word it vertically overlaps and is close to
+        words = []
+        for x, y, width, height, score, text in self.find_glyphs(gray):
+            for word in words:
+                if (y < word[3] and word[1] < y + height and
+                        x - word[2] <= self.space_ratio * max(height, word[3] - word[1])):
+                    word[1], word[2], word[3] = min(word[1], y), max(word[2], x + width), max(word[3], y + height)
+                    word[4] = min(word[4], score)
+                    word[5] += text
+                    break
+            else:
+                words.append([x, y, x + width, y + height, score, text])
+        for x1, y1, x2, y2, score, text in words:
+            boxes.append(Box(x1, y1, to_x=x2, to_y=y2, confidence=score, name=text))
+        return sort_boxes(boxes)
+
+    def recognize(self, image) -> Tuple[str, float]:
+        boxes = self.detect(image)
+        if not boxes:
+            return '', 0
+        return ''.join(box.name for box in boxes), min(box.confidence for box in boxes)
+
+
+def as_backend(engine) -> OcrBackend | None:
+    """
+    The engine as an OcrBackend, a raw RapidOCR instance is wrapped.
+    """
+    if engine is None or isinstance(engine, OcrBackend):
+        return engine
+    return RapidOcrBackend(engine)
+
+
+def create_backend(config) -> OcrBackend:
+    """
+    Create the backend from the ocr config, a dict with 'backend': 'rapidocr_openvino' (default),
+    'rapidocr_onnxruntime' or 'template_glyph' with 'glyph_folder'.
+    """
+    config = config if isinstance(config, dict) else {}
+    backend = config.get('backend', 'rapidocr_openvino')
+    if backend == 'template_glyph':
+        return TemplateGlyphBackend.from_folder(config.get('glyph_folder'),
+                                                threshold=config.get('glyph_threshold', 0.9))
+    if backend == 'rapidocr_onnxruntime':
+        from rapidocr_onnxruntime import RapidOCR
+    elif backend == 'rapidocr_openvino':
+        from rapidocr_openvino import RapidOCR
+    else:
+        raise ValueError(f'unknown ocr backend {backend}, '
+                         f'use rapidocr_openvino, rapidocr_onnxruntime or template_glyph')
+    return RapidOcrBackend(RapidOCR())
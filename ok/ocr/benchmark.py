@@ -0,0 +1,69 @@
+import argparse
+import os
+import statistics
+import time
+
+import cv2
+import numpy as np
+
+from ok.ocr.OcrBackend import create_backend
+
+
+def load_images(folder):
+    images = []
+    for file in sorted(os.listdir(folder)):
+        if os.path.splitext(file)[1].lower() in ('.png', '.jpg', '.bmp'):
+            image = cv2.imdecode(np.fromfile(os.path.join(folder, file), dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is not None:
+                images.append((file, image))
+    return images
+
+
+def benchmark(backend, images, repeat=3, warmup=1):
+    """
+    Run backend.detect on every image, the warmup runs are not measured.
+
+    Returns:
+        dict: latency stats in ms, throughput in images per second and the number of boxes found.
+    """
+    for _ in range(warmup):
+        for _, image in images[:1]:
+            backend.detect(image)
+    latencies = []
+    boxes = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, image in images:
+            image_start = time.perf_counter()
+            boxes += len(backend.detect(image))
+            latencies.append((time.perf_counter() - image_start) * 1000)
+    total = time.perf_counter() - start
+    latencies.sort()
+    return {'images': len(latencies), 'mean_ms': statistics.mean(latencies),
+            'p50_ms': latencies[len(latencies) // 2], 'p95_ms': latencies[min(len(latencies) - 1,
+                                                                            round(len(latencies) * 0.95))],
+            'throughput': len(latencies) / total, 'boxes': boxes // repeat}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure the latency and throughput of OCR backends')
+    parser.add_argument('folder', help='folder of screenshots')
+    parser.add_argument('--backend', action='append',
+                        help='rapidocr_openvino, rapidocr_onnxruntime or template_glyph, can be repeated')
+    parser.add_argument('--glyph-folder', help='glyph images of the template_glyph backend')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=1)
+    args = parser.parse_args()
+
+    if 'template_glyph' in (args.backend or []) and not args.glyph_folder:
+        parser.error('the template_glyph backend needs --glyph-folder')
+    screenshots = load_images(args.folder)
+    if not screenshots:
+        parser.error(f'no image found in {args.folder}')
+    print(f'{len(screenshots)} screenshots from {args.folder}')
+    print(f'{"backend":<24}{"mean ms":>10}{"p50 ms":>10}{"p95 ms":>10}{"images/s":>10}{"boxes":>8}')
+    for name in args.backend or ['rapidocr_openvino']:
+        ocr_backend = create_backend({'backend': name, 'glyph_folder': args.glyph_folder})
+        stats = benchmark(ocr_backend, screenshots, args.repeat, args.warmup)
+        print(f'{name:<24}{stats["mean_ms"]:>10.1f}{stats["p50_ms"]:>10.1f}{stats["p95_ms"]:>10.1f}'
+              f'{stats["throughput"]:>10.1f}{stats["boxes"]:>8}')
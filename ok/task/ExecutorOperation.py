@@ -1,7 +1,7 @@
 import time
 from typing import List
 
-from ok.color.Color import calculate_color_percentage
+from ok.color.Color import calculate_color_percentage, get_saturation
 from ok.config.ConfigOption import ConfigOption
 from ok.feature.Box import Box, find_box_by_name, relative_box
 from ok.feature.FeatureSet import adjust_coordinates
@@ -307,5 +307,8 @@ class ExecutorOperation:
         self.draw_boxes(box.name, box)
         return percentage
 
+    def get_saturation(self, box: Box = None):
+        return get_saturation(self.frame, box, frame_cache=self.executor.frame_cache)
+
     def adb_shell(self, *args, **kwargs):
         return self.executor.device_manager.shell(*args, **kwargs)
@@ -1,6 +1,8 @@
+import os
 import sys
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple
 
 from PySide6.QtCore import QCoreApplication
@@ -13,6 +15,8 @@ from ok.logging.Logger import get_logger
 from ok.stats.StreamStats import StreamStats
 from ok.task.BaseTask import BaseTask
 from ok.task.TriggerTask import TriggerTask
+from ok.util.FrameCache import FrameCache
+from ok.util.LruCache import LruCache
 
 logger = get_logger(__name__)
 
@@ -46,7 +50,8 @@ class TaskExecutor:
                  wait_until_timeout=10, wait_until_before_delay=1, wait_until_check_delay=0,
                  exit_event=None, trigger_tasks=[], onetime_tasks=[], feature_set=None,
                  ocr=None,
-                 config_folder=None, debug=False):
+                 config_folder=None, debug=False, match_workers=0, ocr_cache_size=128, ocr_cache_ttl=5,
+                 ocr_change_threshold=0):
         self.device_manager = device_manager
         self.feature_set = feature_set
         self.wait_until_check_delay = wait_until_check_delay
@@ -60,6 +65,19 @@ class TaskExecutor:
         self.current_task = None
         self.config_folder = config_folder or "config"
         self.trigger_task_index = -1
+        self.frame_cache = FrameCache()
+        # ocr results keyed by the pixels of the ocr area, wait_ocr polling a static dialog hits it
+        self.ocr_cache = LruCache(ocr_cache_size, ttl=ocr_cache_ttl)
+        # wait_ocr skips polls whose area did not change more than this since the last miss, 0 (default) never skips
+        self.ocr_change_threshold = ocr_change_threshold
+        self.ocr_executed = 0
+        self.ocr_skipped = 0
+        # single worker running every ocr inference, the ocr engine is not thread safe
+        self.ocr_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="OcrWorker")
+        # worker pool for template matching, cv2.matchTemplate releases the GIL
+        self.match_workers = match_workers if match_workers > 0 else os.cpu_count() or 1
+        self.match_pool = ThreadPoolExecutor(max_workers=self.match_workers,
+                                             thread_name_prefix="MatchWorker") if self.match_workers > 1 else None
 
         from ok.task.ExecutorOperation import ExecutorOperation
         ExecutorOperation.executor = self
@@ -189,6 +207,22 @@ class TaskExecutor:
                 time.sleep(to_sleep)
             time.sleep(0.1)
 
+    def check_task(self):
+        """
+        The exit, task disabled and pause checks of sleep without sleeping, for polling loops that do not sleep.
+        """
+        if self.debug_mode:
+            return
+        if self.exit_event.is_set():
+            logger.info("check_task Exit event set. Exiting early.")
+            sys.exit(0)
+        if self.current_task and not self.current_task.enabled:
+            self.current_task = None
+            raise TaskDisabledException()
+        if self.paused or (self.current_task is not None and self.current_task.paused):
+            # sleep does not return while paused
+            self.sleep(0.1)
+
     def pause(self, task=None):
         if task is not None:
             if self.current_task != task:
@@ -235,8 +269,26 @@ class TaskExecutor:
             raise WaitFailedException()
         return None
 
+    def ocr_cache_stats(self) -> dict:
+        return self.ocr_cache.stats()
+
+    def count_ocr(self, skipped) -> None:
+        if skipped:
+            self.ocr_skipped += 1
+        else:
+            self.ocr_executed += 1
+
+    def ocr_stats(self) -> dict:
+        """
+        The ocr polls run and skipped by the region change gating of wait_ocr, and the ocr cache stats.
+        """
+        total = self.ocr_executed + self.ocr_skipped
+        return {'executed': self.ocr_executed, 'skipped': self.ocr_skipped,
+                'skip_rate': self.ocr_skipped / total if total else 0, 'cache': self.ocr_cache.stats()}
+
     def reset_scene(self):
         self._frame = None
+        self.frame_cache.clear()
 
     def next_task(self) -> Tuple[BaseTask | None, bool]:
         if self.exit_event.is_set():
@@ -316,6 +368,9 @@ class TaskExecutor:
                 communicate.task.emit(None)
 
         logger.debug(f'exit_event is set, destroy all tasks')
+        if self.match_pool is not None:
+            self.match_pool.shutdown(wait=False)
+        self.ocr_pool.shutdown(wait=False)
         for task in self.onetime_tasks:
             task.on_destroy()
         for task in self.trigger_tasks:
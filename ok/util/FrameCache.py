@@ -0,0 +1,62 @@
+import threading
+
+import cv2
+
+
+class FrameCache:
+    """
+    Derived images (grayscale, HSV) of the current frame, shared by every vision call made on it.
+
+    Entries are only returned for the exact frame object they were computed from, and the TaskExecutor clears the
+    cache whenever it drops the current frame.
+    """
+
+    def __init__(self, min_share=0.5):
+        """
+        Args:
+            min_share (float): An area smaller than this share of the frame is converted on its own, unless the
+                converted frame is already cached, so a poll on a small area never pays for the whole frame.
+        """
+        self.frame = None
+        self.cache = {}
+        self.min_share = min_share
+        self.lock = threading.RLock()
+
+    def clear(self):
+        with self.lock:
+            self.frame = None
+            self.cache = {}
+
+    def get(self, frame, key, create):
+        with self.lock:
+            if frame is not self.frame:
+                self.frame = frame
+                self.cache = {}
+            value = self.cache.get(key)
+            if value is None:
+                value = create(frame)
+                self.cache[key] = value
+            return value
+
+    def gray(self, frame):
+        return self.get(frame, 'gray', lambda image: cv2.cvtColor(image[:, :, :3], cv2.COLOR_BGR2GRAY))
+
+    def hsv(self, frame):
+        return self.get(frame, 'hsv', lambda image: cv2.cvtColor(image[:, :, :3], cv2.COLOR_BGR2HSV))
+
+    def gray_area(self, frame, x1, y1, x2, y2):
+        return self.area(frame, 'gray', cv2.COLOR_BGR2GRAY, x1, y1, x2, y2)
+
+    def hsv_area(self, frame, x1, y1, x2, y2):
+        return self.area(frame, 'hsv', cv2.COLOR_BGR2HSV, x1, y1, x2, y2)
+
+    def area(self, frame, key, code, x1, y1, x2, y2):
+        # the cached conversion of the frame cropped, or the conversion of the crop alone if it is small
+        with self.lock:
+            cached = self.cache.get(key) if frame is self.frame else None
+        if cached is None:
+            crop = frame[y1:y2, x1:x2, :3]
+            if crop.shape[0] * crop.shape[1] < self.min_share * frame.shape[0] * frame.shape[1]:
+                return cv2.cvtColor(crop, code)
+            cached = self.get(frame, key, lambda image: cv2.cvtColor(image[:, :, :3], code))
+        return cached[y1:y2, x1:x2]
@@ -0,0 +1,81 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class LruCache:
+    def __init__(self, max_entries=256, max_bytes=0, ttl=0) -> None:
+        """
+        A thread safe least recently used cache with hit rate stats.
+
+        Args:
+            max_entries (int): Maximum number of entries, 0 disables the cache.
+            max_bytes (int): Maximum total size of the entries as given to put, 0 for no limit.
+            ttl (float): Seconds an entry stays valid after it is put, 0 for no expiry.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key to (value, size, expire time)
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl and entry[2] < time.monotonic():
+                del self.entries[key]
+                self.total_bytes -= entry[1]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size=0):
+        if not self.enabled or (self.max_bytes and size > self.max_bytes):
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self.entries[key] = (value, size, time.monotonic() + self.ttl)
+            self.total_bytes += size
+            while len(self.entries) > self.max_entries or (self.max_bytes and self.total_bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0,
+                'entries': len(self.entries), 'bytes': self.total_bytes, 'evictions': self.evictions,
+                'expirations': self.expirations}
+
+
+def content_hash(image: np.ndarray) -> tuple:
+    """
+    A fast hash of the pixels of an image or a view of it, the shape is part of the hash.
+    """
+    digest = hashlib.blake2b(np.ascontiguousarray(image), digest_size=16).digest()
+    return image.shape, image.dtype.str, digest
@@ -0,0 +1,36 @@
+import unittest
+
+from ok.feature.Box import Box, BoxList, sort_boxes
+
+
+class TestSortBoxes(unittest.TestCase):
+
+    def test_touching_ocr_lines_stay_in_separate_rows(self):
+        # text lines padded by the ocr detection overlap the next line by a couple of pixels
+        boxes = [Box(x, y, 50, 32, 0.9, f'{y}-{x}') for y in (0, 30, 60) for x in (300, 0, 150)]
+        self.assertEqual(['0-0', '0-150', '0-300', '30-0', '30-150', '30-300', '60-0', '60-150', '60-300'],
+                         [box.name for box in sort_boxes(boxes)])
+
+    def test_jittered_boxes_of_one_line_form_a_row(self):
+        boxes = [Box(200, 3, 40, 20, 0.9, 'c'), Box(0, 0, 40, 22, 0.9, 'a'), Box(100, 6, 40, 18, 0.9, 'b'),
+                 Box(0, 40, 40, 20, 0.9, 'd')]
+        self.assertEqual(['a', 'b', 'c', 'd'], [box.name for box in sort_boxes(boxes)])
+
+    def test_tall_box_does_not_merge_the_lines_below_it(self):
+        boxes = [Box(0, 0, 40, 200, 0.9, 'tall'), Box(100, 60, 40, 20, 0.9, 'second'),
+                 Box(200, 30, 40, 20, 0.9, 'first')]
+        self.assertEqual(['tall', 'first', 'second'], [box.name for box in sort_boxes(boxes)])
+
+    def test_small_box_in_a_taller_line_joins_its_row(self):
+        boxes = [Box(30, 0, 60, 40, name='80'), Box(0, 15, 25, 15, name='Lv'), Box(100, 12, 30, 18, name='/90'),
+                 Box(0, 45, 60, 40, name='next')]
+        self.assertEqual(['Lv', '80', '/90', 'next'], [box.name for box in sort_boxes(boxes)])
+
+    def test_box_list_sorted_like_list(self):
+        boxes = [Box(x, y, 50, 32, 0.9, f'{y}-{x}') for y in (60, 0, 30) for x in (150, 0)]
+        self.assertEqual([box.name for box in sort_boxes(boxes)],
+                         [box.name for box in sort_boxes(BoxList(boxes))])
+
+
+if __name__ == '__main__':
+    unittest.main()
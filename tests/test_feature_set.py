@@ -0,0 +1,124 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from ok.feature.FeatureSet import filter_and_sort_matches, match_template_pyramid
+
+
+def pairwise_filter_and_sort_matches(result, threshold, w, h):
+    # the O(n²) selection filter_and_sort_matches replaced, every candidate compared to every selected match
+    loc = np.where(result >= threshold)
+    matches = list(zip(*loc[::-1]))
+    confidences = result[result >= threshold]
+    matches_with_confidence = sorted(zip(matches, confidences), key=lambda x: x[1], reverse=True)
+    selected_matches = []
+
+    def is_overlapping(match, selected):
+        x1, y1 = match
+        for (x2, y2), _ in selected:
+            if x1 < x2 + w and x1 + w > x2 and y1 < y2 + h and y1 + h > y2:
+                return True
+        return False
+
+    for match, confidence in matches_with_confidence:
+        if not is_overlapping(match, selected_matches):
+            selected_matches.append((match, confidence))
+    return selected_matches
+
+
+def normalized(matches):
+    return [((int(x), int(y)), float(confidence)) for (x, y), confidence in matches]
+
+
+class TestFilterAndSortMatches(unittest.TestCase):
+
+    def assert_same_selection(self, result, threshold, w, h):
+        self.assertEqual(normalized(pairwise_filter_and_sort_matches(result.copy(), threshold, w, h)),
+                         normalized(filter_and_sort_matches(result.copy(), threshold, w, h)),
+                         f'{result.shape} threshold {threshold} template {w}x{h}')
+
+    def assert_same_selection_for_sizes(self, result, thresholds=(0.3, 0.5, 0.8)):
+        for threshold in thresholds:
+            for w, h in ((1, 1), (3, 2), (5, 7), (12, 4)):
+                self.assert_same_selection(result, threshold, w, h)
+
+    def test_random_maps(self):
+        rng = np.random.default_rng(1)
+        for _ in range(8):
+            self.assert_same_selection_for_sizes(rng.random(tuple(rng.integers(1, 40, 2))).astype(np.float32))
+
+    def test_plateaus(self):
+        rng = np.random.default_rng(2)
+        for _ in range(8):
+            result = np.round(rng.random(tuple(rng.integers(1, 40, 2))) * 3) / 3
+            self.assert_same_selection_for_sizes(result.astype(np.float32))
+        self.assert_same_selection_for_sizes(np.ones((20, 30), dtype=np.float32))
+
+    def test_nan_and_inf(self):
+        rng = np.random.default_rng(3)
+        for _ in range(8):
+            result = rng.random(tuple(rng.integers(1, 40, 2))).astype(np.float32)
+            result[rng.random(result.shape) < 0.1] = np.nan
+            result[rng.random(result.shape) < 0.05] = np.inf
+            result[rng.random(result.shape) < 0.05] = -np.inf
+            self.assert_same_selection_for_sizes(result)
+
+    def test_overlapping_peaks(self):
+        rng = np.random.default_rng(4)
+        for _ in range(8):
+            result = cv2.GaussianBlur(rng.random(tuple(rng.integers(5, 60, 2))).astype(np.float32), (7, 7), 0)
+            result = (result - result.min()) / max(float(result.max() - result.min()), 1e-6)
+            self.assert_same_selection_for_sizes(result)
+
+    def test_ramp_keeps_matches_off_the_peaks(self):
+        # every location of a ramp but its end has a higher neighbor, a template width further is still a match
+        result = np.tile(np.linspace(0, 1, 40, dtype=np.float32), (10, 1))
+        self.assert_same_selection_for_sizes(result)
+        self.assertGreater(len(filter_and_sort_matches(result, 0.5, 5, 20)), 1)
+
+    def test_nothing_above_threshold(self):
+        self.assertEqual([], filter_and_sort_matches(np.zeros((10, 10), dtype=np.float32), 0.5, 3, 3))
+
+
+class TestMatchTemplatePyramid(unittest.TestCase):
+
+    def crisp_text(self, rng):
+        # ui text on a flat background, the coarse pass scores it low when its blocks are misaligned
+        image = np.full((240, 320, 3), (40, 30, 20), dtype=np.uint8)
+        for _ in range(12):
+            cv2.putText(image, ''.join(rng.choice(list('ABCDEFGH0123456789'), 5)),
+                        (int(rng.integers(0, 260)), int(rng.integers(15, 235))), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                        (255, 255, 255), 1)
+        return image
+
+    def assert_same_matches(self, image, x, y, threshold=0.95):
+        template = image[y:y + 24, x:x + 60].copy()
+        full = filter_and_sort_matches(cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED), threshold, 60, 24)
+        pyramid = filter_and_sort_matches(match_template_pyramid(image, template, None, threshold), threshold, 60,
+                                          24)
+        # the refined windows give the same scores up to the float error of matching a smaller image
+        self.assertEqual(sorted((int(mx), int(my)) for (mx, my), _ in full),
+                         sorted((int(mx), int(my)) for (mx, my), _ in pyramid), f'template at {x}, {y}')
+        confidences = {(int(mx), int(my)): float(confidence) for (mx, my), confidence in pyramid}
+        for (mx, my), confidence in full:
+            self.assertAlmostEqual(float(confidence), confidences[(int(mx), int(my))], delta=1e-3)
+
+    def test_crisp_text_at_every_phase(self):
+        rng = np.random.default_rng(5)
+        for _ in range(50):
+            image = self.crisp_text(rng)
+            x, y = int(rng.integers(0, 260)), int(rng.integers(0, 216))
+            if image[y:y + 24, x:x + 60].std() < 5:
+                continue
+            self.assert_same_matches(image, x, y)
+
+    def test_blurred_noise(self):
+        rng = np.random.default_rng(6)
+        for _ in range(20):
+            image = cv2.blur((rng.random((240, 320, 3)) * 255).astype(np.uint8), (3, 3))
+            self.assert_same_matches(image, int(rng.integers(0, 260)), int(rng.integers(0, 216)))
+
+
+if __name__ == '__main__':
+    unittest.main()
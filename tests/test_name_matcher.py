@@ -0,0 +1,98 @@
+import random
+import re
+import unittest
+
+from ok.feature.Box import Box, find_box_by_name, find_boxes_by_name
+from ok.feature.NameMatcher import NameMatcher
+
+
+def loop_find_box_by_name(boxes, names):
+    # the per box, per pattern loop find_box_by_name replaced
+    if isinstance(names, (str, re.Pattern)):
+        names = [names]
+    result = None
+    priority = len(names)
+    for box in boxes:
+        for i, name in enumerate(names):
+            if (isinstance(name, str) and name == box.name) or (
+                    isinstance(name, re.Pattern) and re.search(name, box.name)):
+                if i < priority:
+                    priority = i
+                    result = box
+                    if i == 0:
+                        break
+    return result
+
+
+def loop_find_boxes_by_name(boxes, names):
+    # the per box, per pattern loop find_boxes_by_name replaced
+    if isinstance(names, (str, re.Pattern)):
+        names = [names]
+    return [box for box in boxes if any(
+        (isinstance(name, str) and name == box.name) or (
+                isinstance(box.name, str) and isinstance(name, re.Pattern) and re.search(name, box.name))
+        for name in names)]
+
+
+def loop_priority(names, name):
+    return next((i for i, pattern in enumerate(names) if
+                 (isinstance(pattern, str) and pattern == name) or (
+                         isinstance(pattern, re.Pattern) and re.search(pattern, name))), None)
+
+
+WORDS = ['start', 'ok', 'cancel', 'Start Game', 'level 10', 'level 7', '确定', 'abab', 'okay', '']
+
+PATTERNS = [re.compile('ok'), re.compile('^start$'), re.compile(r'level \d+'), re.compile(r'\d'),
+            re.compile('game', re.IGNORECASE), re.compile(r'(ab)\1'), re.compile('确'), re.compile('ay$'),
+            re.compile('a'), re.compile('^$')]
+
+
+class TestNameMatcher(unittest.TestCase):
+
+    def random_names(self, rng):
+        names = rng.sample(WORDS, rng.randint(0, 3)) + rng.sample(PATTERNS, rng.randint(1, 4))
+        rng.shuffle(names)
+        return names
+
+    def random_boxes(self, rng):
+        texts = WORDS + ['game over', 'the level 3 ok', 'ababab', 'no match']
+        return [Box(i, 0, 10, 10, 0.9, rng.choice(texts)) for i in range(rng.randint(0, 8))]
+
+    def test_priority_same_as_loop(self):
+        rng = random.Random(1)
+        for _ in range(500):
+            names = self.random_names(rng)
+            matcher = NameMatcher(names)
+            for text in WORDS + ['game over', 'the level 3 ok', 'ababab', 'no match']:
+                self.assertEqual(loop_priority(names, text), matcher.priority(text), f'{names} {text}')
+
+    def test_find_box_by_name_same_as_loop(self):
+        rng = random.Random(2)
+        for _ in range(500):
+            names = self.random_names(rng)
+            boxes = self.random_boxes(rng)
+            self.assertIs(loop_find_box_by_name(boxes, names), find_box_by_name(boxes, names), f'{names} {boxes}')
+            self.assertIs(loop_find_box_by_name(boxes, names), find_box_by_name(boxes, NameMatcher(names)))
+
+    def test_find_boxes_by_name_same_as_loop(self):
+        rng = random.Random(3)
+        for _ in range(500):
+            names = self.random_names(rng)
+            boxes = self.random_boxes(rng)
+            self.assertEqual(loop_find_boxes_by_name(boxes, names), find_boxes_by_name(boxes, names),
+                             f'{names} {boxes}')
+
+    def test_earlier_pattern_matching_further_right_wins(self):
+        # the combined alternation finds 'level 3' first, the pattern listed before it matches further right
+        names = [re.compile('ok'), re.compile(r'level \d+')]
+        self.assertEqual(0, NameMatcher(names).priority('the level 3 ok'))
+
+    def test_single_name_and_pattern(self):
+        self.assertEqual(0, NameMatcher('ok').priority('ok'))
+        self.assertIsNone(NameMatcher('ok').priority('okay'))
+        self.assertEqual(0, NameMatcher(re.compile('ok')).priority('okay'))
+        self.assertIsNone(NameMatcher(['ok']).priority(None))
+
+
+if __name__ == '__main__':
+    unittest.main()